@@ -1,7 +1,7 @@
-from .const import ATTR_CHARGE, SERVICE_SET_CHARGE, ATTR_TEMPERATURE, SERVICE_SET_TARGET_TEMPERATURE, ATTR_START_DATE, ATTR_END_DATE, SERVICE_SET_HOLIDAY_DATES, SERVICE_CLEAR_HOLIDAY_DATES, SERVICE_SET_DEFAULT_HEAT_SOURCE, ATTR_HEAT_SOURCE
-from datetime import timedelta
+from .const import ATTR_CHARGE, SERVICE_SET_CHARGE, ATTR_TEMPERATURE, SERVICE_SET_TARGET_TEMPERATURE, ATTR_START_DATE, ATTR_END_DATE, SERVICE_SET_HOLIDAY_DATES, SERVICE_CLEAR_HOLIDAY_DATES, SERVICE_SET_DEFAULT_HEAT_SOURCE, ATTR_HEAT_SOURCE, CONF_FAST_POLL_INTERVAL, CONF_SLOW_POLL_INTERVAL, DEFAULT_FAST_POLL_INTERVAL, DEFAULT_SLOW_POLL_INTERVAL, CONF_OPTIMISTIC_WRITES, DEFAULT_OPTIMISTIC_WRITES, DEADBAND_FIELDS, CONF_DEADBAND, CONF_RELATIVE_DEADBAND, DEFAULT_DEADBANDS, DEFAULT_RELATIVE_DEADBAND, CONF_MAX_SILENCE, DEFAULT_MAX_SILENCE, CONF_STALE_AFTER, DEFAULT_STALE_AFTER
 import logging
 import asyncio
+from datetime import timedelta
 import voluptuous as vol
 from homeassistant import core
 from homeassistant.const import CONF_PASSWORD, CONF_USERNAME, Platform
@@ -10,6 +10,8 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.config_validation import make_entity_service_schema
 from homeassistant.helpers.service import verify_domain_control
 from .tank import Tank
+from .account import async_get_account, async_release_account
+from .poller import AdaptivePollPolicy
 from typing import Final, final
 import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
@@ -34,27 +36,77 @@ async def async_setup_entry(hass: HomeAssistant, entry:ConfigEntry) -> bool:
 
     """Set up a tank from a config entry."""
 
-    tank = Tank(hass, entry.data[CONF_USERNAME],entry.data[CONF_PASSWORD],entry.data["serial_number"])
+    # Tanks on the same account share one login, token and tank list.
+    account = async_get_account(hass, entry.data[CONF_USERNAME], entry.data[CONF_PASSWORD])
+    account.entry_ids.add(entry.entry_id)
+
+    # Relative deadbands are entered as percentages.
+    deadbands = {
+        field: (
+            entry.options.get(CONF_DEADBAND.format(field), DEFAULT_DEADBANDS[field]),
+            entry.options.get(CONF_RELATIVE_DEADBAND.format(field), DEFAULT_RELATIVE_DEADBAND) / 100
+        )
+        for field in DEADBAND_FIELDS
+    }
+
+    tank = Tank(
+        hass,
+        account,
+        entry.data["serial_number"],
+        entry.options.get(CONF_OPTIMISTIC_WRITES, DEFAULT_OPTIMISTIC_WRITES),
+        deadbands,
+        timedelta(seconds=entry.options.get(CONF_MAX_SILENCE, DEFAULT_MAX_SILENCE)),
+        timedelta(seconds=entry.options.get(CONF_STALE_AFTER, DEFAULT_STALE_AFTER))
+    )
+
+    # Reuse the links discovered last time, so the first refresh doesn't have to walk the API again.
+    await tank.async_load_discovery()
 
     async def async_update_data():
         _LOGGER.info("Fetching data from Mixergy...")
         await tank.fetch_data()
 
-    # Create a coordinator to fetch data from the Mixergy API.
-    coordinator = DataUpdateCoordinator(hass, _LOGGER, name="Mixergy", update_method = async_update_data, update_interval = timedelta(seconds=30))
-    await coordinator.async_config_entry_first_refresh()
+    # Create a coordinator to fetch data from the Mixergy API. It has no interval of its own, as the
+    # account's poller refreshes all of the account's tanks together.
+    coordinator = DataUpdateCoordinator(hass, _LOGGER, name="Mixergy", update_method = async_update_data, update_interval = None)
+
+    # With the state saved last time, the entities can start straight away (marked as stale) while the tank
+    # is fetched in the background. Without one, setup has to wait for the first fetch.
+    if await tank.async_restore_state():
+        entry.async_create_background_task(hass, coordinator.async_refresh(), f"mixergy {tank.serial_number} first refresh")
+    else:
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except Exception:
+            # Setup will be retried, with a new tank, so don't leave this one holding the account.
+            await async_release_account(hass, account, entry.entry_id)
+            raise
+
+    policy = AdaptivePollPolicy(
+        entry.options.get(CONF_FAST_POLL_INTERVAL, DEFAULT_FAST_POLL_INTERVAL),
+        entry.options.get(CONF_SLOW_POLL_INTERVAL, DEFAULT_SLOW_POLL_INTERVAL)
+    )
+
+    account.poller.add_tank(tank, coordinator, policy)
 
     hass.data[DOMAIN][entry.entry_id] = {
+        "account": account,
         "tank": tank,
         "coordinator": coordinator,
     }
 
     _register_services(hass)
 
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
     return True
 
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Reload the tank when its options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
 
     unload_ok = all(
@@ -67,7 +119,9 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     )
 
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        data = hass.data[DOMAIN].pop(entry.entry_id)
+        data["account"].poller.remove_tank(data["tank"].serial_number)
+        await async_release_account(hass, data["account"], entry.entry_id)
 
     return unload_ok
 
@@ -0,0 +1,327 @@
+import logging
+import asyncio
+import base64
+import hashlib
+import json
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from homeassistant import core
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.helpers.storage import Store
+from .const import DOMAIN, TOKEN_REFRESH_MARGIN
+from .poller import AccountPoller
+from .transport import Transport, CircuitBreaker
+
+_LOGGER = logging.getLogger(__name__)
+
+ROOT_ENDPOINT = "https://www.mixergy.io/api/v2"
+
+DISCOVERY_STORAGE_VERSION = 1
+
+DATA_ACCOUNTS = f"{DOMAIN}_accounts"
+
+def _decode_token_expiry(token):
+    """Returns the expiry of a JWT as a unix timestamp, or None if it can't be read."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+def _auth_headers(token, headers=None):
+    auth_headers = {'Authorization': f'Bearer {token}'}
+
+    if headers:
+        auth_headers.update(headers)
+
+    return auth_headers
+
+@core.callback
+def async_get_account(hass, username, password):
+    """Returns the account shared by every config entry using this username, creating it if needed."""
+
+    accounts = hass.data.setdefault(DATA_ACCOUNTS, {})
+
+    key = username.lower()
+
+    account = accounts.get(key)
+
+    if account is None:
+        account = MixergyAccount(hass, username, password)
+        accounts[key] = account
+
+        async def async_close_account(event):
+            # The listener has already fired, so there's nothing left to unsubscribe.
+            account.unsub_close = None
+            await account.async_close()
+
+        account.unsub_close = hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, async_close_account)
+    elif account.password != password:
+        account.update_password(password)
+
+    return account
+
+async def async_release_account(hass, account, entry_id):
+    """Releases an entry's hold on the account, closing it once no entries are using it."""
+
+    account.entry_ids.discard(entry_id)
+
+    if not account.entry_ids:
+        hass.data.get(DATA_ACCOUNTS, {}).pop(account.username.lower(), None)
+        await account.async_close()
+
+class MixergyAccount:
+    """Owns the login, token and link discovery for a Mixergy account, shared by all of its tanks."""
+
+    def __init__(self, hass, username, password):
+        self._hass = hass
+        self.username = username
+        self.password = password
+        self.entry_ids = set()
+        self.unsub_close = None
+        self.poller = AccountPoller(hass)
+
+        # One circuit breaker per account, so a failing API stops being called by all of the account's tanks.
+        self._transport = Transport(hass, CircuitBreaker())
+        self._token = ""
+        self._token_expires_at = None
+        self._login_lock = asyncio.Lock()
+        self._account_url = ""
+        self._login_url = ""
+        self._tank_list = None
+        self._tank_list_lock = asyncio.Lock()
+        self._tank_discovery = {}
+        self._discovery_loaded = False
+        self._discovery_lock = asyncio.Lock()
+
+        # Usernames are email addresses, so hash them rather than putting them in a file name.
+        account_key = hashlib.sha1(username.lower().encode()).hexdigest()[:12]
+        self._discovery_store = Store(hass, DISCOVERY_STORAGE_VERSION, f"{DOMAIN}.{account_key}.discovery")
+
+    @property
+    def circuit_open(self):
+        return self._transport.breaker.is_open
+
+    @property
+    def consecutive_failures(self):
+        return self._transport.breaker.failures
+
+    @property
+    def connections_created(self):
+        return self._transport.connections_created
+
+    @property
+    def connections_reused(self):
+        return self._transport.connections_reused
+
+    async def async_close(self):
+
+        if self.unsub_close is not None:
+            self.unsub_close()
+            self.unsub_close = None
+
+        await self._transport.async_close()
+
+    def update_password(self, password):
+        self.password = password
+        self._token = ""
+        self._token_expires_at = None
+
+    def _token_is_fresh(self):
+
+        if not self._token:
+            return False
+
+        # Without a readable expiry we keep using the token until the API rejects it.
+        if self._token_expires_at is None:
+            return True
+
+        return time.time() < self._token_expires_at - TOKEN_REFRESH_MARGIN.total_seconds()
+
+    async def authenticate(self):
+
+        if self._token_is_fresh():
+            _LOGGER.debug("Authentication token is valid")
+            return True
+
+        async with self._login_lock:
+
+            # Another request may have logged in while we were waiting for the lock.
+            if self._token_is_fresh():
+                return True
+
+            return await self._login()
+
+    async def _relogin(self, rejected_token):
+
+        async with self._login_lock:
+
+            # If the token has already been replaced, whoever replaced it has done the work for us.
+            if self._token != rejected_token:
+                return bool(self._token)
+
+            self._token = ""
+
+            return await self._login()
+
+    async def _login(self):
+
+        if not self._login_url:
+
+            async with self._transport.request("GET", ROOT_ENDPOINT) as resp:
+
+                if resp.status != 200:
+                    _LOGGER.error("Fetch of root at %s failed with status code %i", ROOT_ENDPOINT, resp.status)
+                    return False
+
+                root_result = await resp.json()
+
+                self._account_url = root_result["_links"]["account"]["href"]
+
+                _LOGGER.info("Account URL: %s", self._account_url)
+
+            async with self._transport.request("GET", self._account_url) as resp:
+
+                if resp.status != 200:
+                    _LOGGER.error("Fetch of account at %s failed with status code %i", self._account_url, resp.status)
+                    return False
+
+                account_result = await resp.json()
+
+                self._login_url = account_result["_links"]["login"]["href"]
+
+                _LOGGER.info("Login URL: %s", self._login_url)
+
+            await self._async_save_discovery()
+
+        async with self._transport.request("POST", self._login_url, json={'username': self.username, 'password': self.password}) as resp:
+
+            if resp.status != 201:
+                _LOGGER.error("Authentication failed with status code %i", resp.status)
+
+                # The login link may have come from the discovery cache, so look it up again next time.
+                if resp.status == 404:
+                    self._login_url = ""
+
+                return False
+
+            login_result = await resp.json()
+            token = login_result['token']
+            self._token = token
+            self._token_expires_at = _decode_token_expiry(token)
+
+            if self._token_expires_at is None:
+                _LOGGER.debug("Could not read the expiry of the authentication token")
+            else:
+                _LOGGER.debug("Authentication token expires at %s", datetime.fromtimestamp(self._token_expires_at))
+
+            return True
+
+    @asynccontextmanager
+    async def request(self, method, url, headers=None, priority=None, **kwargs):
+        """Makes an authenticated request. If the token is rejected, logs in again and replays the request once.
+
+        Without a priority, the transport treats reads as background polls and writes as the user's.
+        """
+
+        await self.authenticate()
+
+        token = self._token
+
+        resp = await self._transport.send(method, url, priority=priority, headers=_auth_headers(token, headers), **kwargs)
+
+        try:
+            if resp.status == 401 and token:
+                resp.release()
+
+                _LOGGER.info("Call to %s was unauthorized, logging in again", url)
+
+                if await self._relogin(token):
+                    resp = await self._transport.send(method, url, priority=priority, headers=_auth_headers(self._token, headers), **kwargs)
+
+            yield resp
+        finally:
+            resp.release()
+
+    async def async_get_tank_list(self, refresh=False):
+        """Returns the account's tank list. It's fetched once and shared by every tank unless a refresh is asked for."""
+
+        async with self._tank_list_lock:
+
+            if self._tank_list is not None and not refresh:
+                return self._tank_list
+
+            async with self.request("GET", ROOT_ENDPOINT) as resp:
+
+                if resp.status != 200:
+                    _LOGGER.error("Fetch of root at %s failed with status code %i", ROOT_ENDPOINT, resp.status)
+                    return None
+
+                root_result = await resp.json()
+
+                tanks_url = root_result["_links"]["tanks"]["href"]
+
+            async with self.request("GET", tanks_url) as resp:
+
+                if resp.status != 200:
+                    _LOGGER.error("Fetch of tanks at %s failed with status code %i", tanks_url, resp.status)
+                    return None
+
+                tank_result = await resp.json()
+
+                self._tank_list = tank_result['_embedded']['tankList']
+
+                _LOGGER.debug(self._tank_list)
+
+                return self._tank_list
+
+    async def async_load_discovery(self):
+        """Restores the links found by a previous discovery. Only the first caller reads the store."""
+
+        async with self._discovery_lock:
+
+            if self._discovery_loaded:
+                return
+
+            self._discovery_loaded = True
+
+            data = await self._discovery_store.async_load()
+
+            if not data:
+                return
+
+            # Don't overwrite links that have been discovered since the account was created.
+            if not self._login_url:
+                self._account_url = data.get("account_url", "")
+                self._login_url = data.get("login_url", "")
+
+            self._tank_discovery = {**data.get("tanks", {}), **self._tank_discovery}
+
+            _LOGGER.debug("Loaded discovery cache for %i tank(s)", len(self._tank_discovery))
+
+    def tank_discovery(self, serial_number):
+        return self._tank_discovery.get(serial_number)
+
+    async def async_save_tank_discovery(self, serial_number, discovery):
+
+        self._tank_discovery[serial_number] = discovery
+
+        await self._async_save_discovery()
+
+    def forget_tank_discovery(self, serial_number):
+        self._tank_discovery.pop(serial_number, None)
+
+    async def _async_save_discovery(self):
+
+        # The file holds every tank on the account, so read it first, otherwise saving one tank's links (e.g.
+        # from the config flow's throwaway account) would drop the others'.
+        await self.async_load_discovery()
+
+        await self._discovery_store.async_save({
+            "account_url": self._account_url,
+            "login_url": self._login_url,
+            "tanks": self._tank_discovery,
+        })
@@ -0,0 +1,34 @@
+import statistics
+from collections import deque
+
+class CadenceEstimator:
+    """Learns how often a tank reports a new measurement, from the gaps between the ones we've seen.
+
+    The estimate is the median of the recent gaps, so the odd long gap (e.g. while the tank was offline)
+    doesn't throw it off. There's no estimate until enough gaps have been seen.
+    """
+
+    def __init__(self, samples=9, min_samples=3):
+        self._gaps = deque(maxlen=samples)
+        self._min_samples = min_samples
+        self._last = None
+
+    @property
+    def interval(self):
+
+        if len(self._gaps) < self._min_samples:
+            return None
+
+        return statistics.median(self._gaps)
+
+    def observe(self, reported_at, sample=True):
+        """Records a new measurement, reported at the given time in seconds.
+
+        If sample is False, the gap since the last one isn't used, e.g. because we can't tell how much of it
+        was down to when we polled rather than when the tank reported.
+        """
+
+        if sample and self._last is not None and reported_at > self._last:
+            self._gaps.append(reported_at - self._last)
+
+        self._last = reported_at
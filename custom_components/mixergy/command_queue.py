@@ -0,0 +1,104 @@
+import logging
+import asyncio
+from collections import deque
+from contextvars import ContextVar
+from .single_flight import wait_shared
+
+_LOGGER = logging.getLogger(__name__)
+
+# Set while commands are running, so the requests they make (and any fetches they start) can be told apart from
+# background polls.
+running_command = ContextVar("running_command", default=False)
+
+class _Command:
+
+    __slots__ = ("key", "factory", "future", "enqueued_at")
+
+    def __init__(self, key, factory, future, enqueued_at):
+        self.key = key
+        self.factory = factory
+        self.future = future
+        self.enqueued_at = enqueued_at
+
+class CommandQueue:
+    """Runs a tank's writes one at a time, in the order they were made.
+
+    Commands are given a key for the thing they change. If a command is submitted while another with the
+    same key is still waiting to run, the new one takes the waiting one's place (and both callers get its
+    result), so bursts of changes to the same thing only write the latest. Commands with no key are never
+    merged.
+    """
+
+    def __init__(self, hass):
+        self._hass = hass
+        self._queue = deque()
+        self._waiting = {}
+        self._worker = None
+        self.processed = 0
+        self.superseded = 0
+        self.last_latency = None
+        self._total_latency = 0.0
+
+    @property
+    def depth(self):
+        return len(self._queue)
+
+    @property
+    def average_latency(self):
+        if not self.processed:
+            return None
+
+        return self._total_latency / self.processed
+
+    async def submit(self, key, factory):
+
+        loop = asyncio.get_running_loop()
+
+        command = self._waiting.get(key) if key is not None else None
+
+        if command is not None:
+            _LOGGER.debug("Replacing queued %s command", key)
+            command.factory = factory
+            self.superseded += 1
+        else:
+            command = _Command(key, factory, loop.create_future(), loop.time())
+            self._queue.append(command)
+
+            if key is not None:
+                self._waiting[key] = command
+
+        if self._worker is None:
+            self._worker = self._hass.async_create_task(self._async_run())
+
+        return await wait_shared(command.future)
+
+    async def _async_run(self):
+
+        loop = asyncio.get_running_loop()
+
+        # The worker runs in its own task, so this only applies to the commands.
+        running_command.set(True)
+
+        try:
+            while self._queue:
+                command = self._queue.popleft()
+
+                if command.key is not None:
+                    self._waiting.pop(command.key, None)
+
+                try:
+                    result = await command.factory()
+                except Exception as err:  # pylint: disable=broad-except
+                    command.future.set_exception(err)
+                else:
+                    command.future.set_result(result)
+
+                latency = loop.time() - command.enqueued_at
+
+                self.processed += 1
+                self.last_latency = latency
+                self._total_latency += latency
+
+                _LOGGER.debug("Ran %s command in %.2fs, %i still queued", command.key or "unkeyed", latency, len(self._queue))
+        finally:
+            self._worker = None
@@ -4,7 +4,8 @@ import voluptuous as vol
 
 from homeassistant import config_entries, core, exceptions
 from .tank import Tank
-from .const import DOMAIN  # pylint:disable=unused-import
+from .account import MixergyAccount
+from .const import DOMAIN, CONF_FAST_POLL_INTERVAL, CONF_SLOW_POLL_INTERVAL, DEFAULT_FAST_POLL_INTERVAL, DEFAULT_SLOW_POLL_INTERVAL, CONF_OPTIMISTIC_WRITES, DEFAULT_OPTIMISTIC_WRITES, DEADBAND_FIELDS, CONF_DEADBAND, CONF_RELATIVE_DEADBAND, DEFAULT_DEADBANDS, DEFAULT_RELATIVE_DEADBAND, CONF_MAX_SILENCE, DEFAULT_MAX_SILENCE, CONF_STALE_AFTER, DEFAULT_STALE_AFTER
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -39,17 +40,22 @@ async def validate_input(hass: core.HomeAssistant, data: dict):
     if len(data["serial_number"]) <= 0:
         raise InvalidSerialNumber
 
-    tank = Tank(hass, data["username"],data["password"],data["serial_number"])
+    # Use a throwaway account here, the shared one is only created once the entry is set up.
+    account = MixergyAccount(hass, data["username"], data["password"])
+    tank = Tank(hass, account, data["serial_number"])
 
-    result = await tank.test_authentication()
+    try:
+        result = await tank.test_authentication()
 
-    if not result:
-        raise AuthenticationFailed
+        if not result:
+            raise AuthenticationFailed
 
-    result = await tank.test_connection()
+        result = await tank.test_connection()
 
-    if not result:
-        raise TankNotFound
+        if not result:
+            raise TankNotFound
+    finally:
+        await account.async_close()
 
     # Return info that you want to store in the config entry.
     # "Title" is what is displayed to the user for this hub device
@@ -68,6 +74,11 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     # changes.
     CONNECTION_CLASS = config_entries.CONN_CLASS_LOCAL_PUSH
 
+    @staticmethod
+    @core.callback
+    def async_get_options_flow(config_entry):
+        return OptionsFlowHandler()
+
     async def async_step_user(self, user_input=None):
         """Handle the initial step."""
         # This goes through the steps to take the user through the setup process.
@@ -114,6 +125,42 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             step_id="user", data_schema=DATA_SCHEMA, errors=errors
         )
 
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle the polling and write options for a tank."""
+
+    async def async_step_init(self, user_input=None):
+
+        errors = {}
+
+        if user_input is not None:
+            if user_input[CONF_FAST_POLL_INTERVAL] > user_input[CONF_SLOW_POLL_INTERVAL]:
+                errors["base"] = "invalid_poll_intervals"
+            elif user_input[CONF_STALE_AFTER] <= user_input[CONF_SLOW_POLL_INTERVAL]:
+                errors["base"] = "invalid_stale_after"
+            else:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+
+        schema = vol.Schema({
+            vol.Required(CONF_FAST_POLL_INTERVAL, default=options.get(CONF_FAST_POLL_INTERVAL, DEFAULT_FAST_POLL_INTERVAL)): vol.All(vol.Coerce(int), vol.Range(min=10, max=300)),
+            vol.Required(CONF_SLOW_POLL_INTERVAL, default=options.get(CONF_SLOW_POLL_INTERVAL, DEFAULT_SLOW_POLL_INTERVAL)): vol.All(vol.Coerce(int), vol.Range(min=30, max=3600)),
+            vol.Required(CONF_OPTIMISTIC_WRITES, default=options.get(CONF_OPTIMISTIC_WRITES, DEFAULT_OPTIMISTIC_WRITES)): bool,
+        })
+
+        for field in DEADBAND_FIELDS:
+            schema = schema.extend({
+                vol.Required(CONF_DEADBAND.format(field), default=options.get(CONF_DEADBAND.format(field), DEFAULT_DEADBANDS[field])): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Required(CONF_RELATIVE_DEADBAND.format(field), default=options.get(CONF_RELATIVE_DEADBAND.format(field), DEFAULT_RELATIVE_DEADBAND)): vol.All(vol.Coerce(float), vol.Range(min=0, max=100)),
+            })
+
+        schema = schema.extend({
+            vol.Required(CONF_MAX_SILENCE, default=options.get(CONF_MAX_SILENCE, DEFAULT_MAX_SILENCE)): vol.All(vol.Coerce(int), vol.Range(min=60, max=86400)),
+            vol.Required(CONF_STALE_AFTER, default=options.get(CONF_STALE_AFTER, DEFAULT_STALE_AFTER)): vol.All(vol.Coerce(int), vol.Range(min=60, max=86400)),
+        })
+
+        return self.async_show_form(step_id="init", data_schema=schema, errors=errors)
+
 class CannotConnect(exceptions.HomeAssistantError):
     """Error to indicate we could not reach the Mixergy API."""
 
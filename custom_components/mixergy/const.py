@@ -1,4 +1,6 @@
 # Consts for the Mixergy integration
+from datetime import timedelta
+
 DOMAIN = "mixergy"
 
 SERVICE_SET_CHARGE = "mixergy_set_charge"
@@ -11,4 +13,99 @@ ATTR_CHARGE = "charge"
 ATTR_TEMPERATURE = "temperature"
 ATTR_START_DATE = "start_date"
 ATTR_END_DATE = "end_date"
-ATTR_HEAT_SOURCE = "heat_source"
\ No newline at end of file
+ATTR_HEAT_SOURCE = "heat_source"
+
+# How often each group of endpoints is refreshed. The measurement is polled by the coordinator, while the
+# settings and schedule only change through our own writes, so they can be refreshed much less often.
+MEASUREMENT_REFRESH_INTERVAL = timedelta(seconds=30)
+SETTINGS_REFRESH_INTERVAL = timedelta(minutes=5)
+SCHEDULE_REFRESH_INTERVAL = timedelta(minutes=15)
+
+# The most tanks on one account that are polled at the same time.
+MAX_CONCURRENT_TANK_POLLS = 4
+
+# Options for adaptive polling. Tanks that are heating, or have just been changed, are polled at the fast
+# interval. Tanks on holiday, or whose charge isn't changing, are polled at the slow one.
+CONF_FAST_POLL_INTERVAL = "fast_poll_interval"
+CONF_SLOW_POLL_INTERVAL = "slow_poll_interval"
+
+DEFAULT_FAST_POLL_INTERVAL = 15
+DEFAULT_SLOW_POLL_INTERVAL = 300
+
+# Whether writes update the tank's state straight away, rather than waiting for it to be fetched again.
+CONF_OPTIMISTIC_WRITES = "optimistic_writes"
+DEFAULT_OPTIMISTIC_WRITES = True
+
+# Options for deadbands. Changes to these fields smaller than their band aren't written to Home Assistant (or
+# fired as events), which keeps sensor noise out of the recorder. Each field has an absolute band, in its own
+# unit, and a relative one, as a percentage of the last value written. Any change is written once the max
+# silence, in seconds, has passed since the last write.
+DEADBAND_FIELDS = ("hot_water_temperature", "coldest_water_temperature", "charge", "pv_power", "clamp_power")
+
+CONF_DEADBAND = "{}_deadband"
+CONF_RELATIVE_DEADBAND = "{}_relative_deadband"
+CONF_MAX_SILENCE = "max_silence"
+
+DEFAULT_DEADBANDS = {
+    "hot_water_temperature": 0.2,
+    "coldest_water_temperature": 0.2,
+    "charge": 0.5,
+    "pv_power": 0.05,
+    "clamp_power": 50,
+}
+DEFAULT_RELATIVE_DEADBAND = 0
+DEFAULT_MAX_SILENCE = 900
+
+# How old, in seconds, a tank's latest measurement can be before its entities are shown as unavailable.
+CONF_STALE_AFTER = "stale_after"
+DEFAULT_STALE_AFTER = 900
+
+# How long after a write a tank is treated as active.
+RECENT_WRITE_WINDOW = timedelta(minutes=2)
+
+# A target charge that's been written is shown until a measurement taken after the write reports it, or for
+# at most this long.
+CHARGE_CONFIRM_TIMEOUT = timedelta(minutes=5)
+
+# How many polls the charge has to stay the same for before a tank is treated as idle.
+FLAT_CHARGE_POLLS = 3
+
+# Settings writes are held for this long after the last change, so a burst of them can be sent as one PUT.
+# They're never held for longer than the max delay from the first write in the burst.
+SETTINGS_WRITE_DELAY = timedelta(milliseconds=500)
+SETTINGS_WRITE_MAX_DELAY = timedelta(seconds=2)
+
+# The tank's last state is saved at most this often, and restored when Home Assistant starts.
+STATE_SAVE_DELAY = timedelta(seconds=30)
+
+# Random delay added to each tank's poll, on top of its slot in the interval.
+POLL_JITTER = timedelta(seconds=2)
+
+# Log in again this long before the authentication token expires, rather than waiting for a 401.
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+# Idempotent requests are retried this many times in total, backing off exponentially (with jitter) between
+# attempts. Each attempt has its own timeout, and all the attempts for one request share the budget.
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF_BASE = timedelta(seconds=1)
+RETRY_BACKOFF_MAX = timedelta(seconds=10)
+REQUEST_TIMEOUT = timedelta(seconds=10)
+REQUEST_BUDGET = timedelta(seconds=25)
+
+# After this many failures in a row, stop calling the API until the reset timeout has passed.
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = timedelta(minutes=1)
+
+# Each account has its own HTTP session. Connections are kept alive between polls, and DNS lookups cached,
+# so a poll doesn't normally need a new TLS handshake.
+CONNECTION_LIMIT = 4
+DNS_CACHE_TTL = timedelta(minutes=5)
+KEEPALIVE_TIMEOUT = timedelta(minutes=2)
+
+# Every request to the Mixergy API, from every account and tank, shares one rate limiter. It allows this many
+# requests a second on average, in bursts of up to the burst size, with at most this many in flight.
+# Background polls that can't get through within the max wait are dropped.
+RATE_LIMIT = 2
+RATE_LIMIT_BURST = 10
+MAX_CONCURRENT_REQUESTS = 8
+BACKGROUND_MAX_WAIT = timedelta(seconds=30)
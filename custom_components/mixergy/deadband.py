@@ -0,0 +1,49 @@
+import time
+
+class Deadband:
+    """Decides whether a new value has moved far enough from the last one reported to be worth reporting.
+
+    A value is reported when it differs from the last reported one by more than the absolute band, or by more
+    than the relative band (a fraction of the last reported value), whichever is larger. So small differences
+    can't be hidden forever, any change at all is reported once the max silence has passed since the last report.
+    """
+
+    __slots__ = ("absolute", "relative", "max_silence", "_value", "_reported_at")
+
+    def __init__(self, absolute=0, relative=0, max_silence=None):
+        self.absolute = absolute
+        self.relative = relative
+        self.max_silence = max_silence.total_seconds() if max_silence else None
+        self._value = None
+        self._reported_at = None
+
+    def check(self, value, now=None):
+        """Returns whether the value should be reported, and if it should, records it as reported."""
+
+        if now is None:
+            now = time.monotonic()
+
+        if not self._exceeded(value, now):
+            return False
+
+        self._value = value
+        self._reported_at = now
+
+        return True
+
+    def _exceeded(self, value, now):
+
+        if self._reported_at is None:
+            return True
+
+        if value == self._value:
+            return False
+
+        # Anything that isn't a number (e.g. None while a value is unknown) is reported whenever it changes.
+        if not isinstance(value, (int, float)) or not isinstance(self._value, (int, float)):
+            return True
+
+        if self.max_silence is not None and now - self._reported_at >= self.max_silence:
+            return True
+
+        return abs(value - self._value) > max(self.absolute, self.relative * abs(self._value))
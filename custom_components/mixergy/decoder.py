@@ -0,0 +1,43 @@
+import json
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _orjson_loads(data):
+    return orjson.loads(data)
+
+def _json_loads(data):
+    return json.loads(data)
+
+# The decoders that can be used, fastest first. Each takes the raw bytes (or str) of a JSON document.
+DECODERS = {}
+
+if orjson is not None:
+    DECODERS["orjson"] = _orjson_loads
+
+DECODERS["json"] = _json_loads
+
+_decoder = next(iter(DECODERS))
+_loads = DECODERS[_decoder]
+
+def loads(data):
+    """Decodes a JSON document, using the fastest decoder available."""
+    return _loads(data)
+
+def decoder_name():
+    return _decoder
+
+def set_decoder(name):
+    """Switches to one of the DECODERS, e.g. to compare them."""
+
+    global _decoder, _loads
+
+    _loads = DECODERS[name]
+    _decoder = name
+
+    _LOGGER.debug("Decoding JSON with %s", name)
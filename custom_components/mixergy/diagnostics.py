@@ -0,0 +1,43 @@
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from .const import DOMAIN
+from .rate_limiter import async_get_rate_limiter
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Return diagnostics for a config entry."""
+
+    data = hass.data[DOMAIN][entry.entry_id]
+    account = data["account"]
+    tank = data["tank"]
+
+    limiter = async_get_rate_limiter(hass)
+
+    return {
+        "serial_number": tank.serial_number,
+        "rate_limiter": {
+            "acquired": limiter.acquired,
+            "dropped": limiter.dropped,
+            "queued": limiter.queued,
+            "average_wait": limiter.average_wait,
+            "total_wait": limiter.total_wait,
+        },
+        "account": {
+            "tanks": account.poller.tank_count,
+            "circuit_open": account.circuit_open,
+            "consecutive_failures": account.consecutive_failures,
+            "connections_created": account.connections_created,
+            "connections_reused": account.connections_reused,
+        },
+        "command_queue": {
+            "depth": tank.command_queue_depth,
+            "average_latency": tank.command_latency,
+        },
+        "state": {
+            "memory_size": tank.state_memory_size,
+            "online": tank.online,
+            "stale": tank.stale,
+            "endpoints": tank.endpoint_health(),
+            "reporting_interval": tank.reporting_interval,
+            "repeated_measurements": tank.repeated_measurements,
+        },
+    }
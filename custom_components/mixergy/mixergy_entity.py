@@ -4,7 +4,12 @@ from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 class MixergyEntityBase(CoordinatorEntity):
 
-    should_poll = True
+    # The tank pushes updates to the entities that read the fields that changed, so Home Assistant doesn't
+    # need to poll them as well.
+    should_poll = False
+
+    # The tank fields this entity's state is built from. An entity with no inputs is written on every update.
+    inputs = ()
 
     def __init__(self, coordinator, tank:Tank):
         super().__init__(coordinator)        
@@ -25,8 +30,13 @@ class MixergyEntityBase(CoordinatorEntity):
     def available(self) -> bool:
         return self._tank.online
 
+    @property
+    def extra_state_attributes(self):
+        # Set while the entity is showing the state restored at startup, until the tank has been fetched.
+        return {"stale": self._tank.stale}
+
     async def async_added_to_hass(self):
-        self._tank.register_callback(self.async_write_ha_state)
+        self._tank.register_callback(self.async_write_ha_state, self.inputs)
 
     async def async_will_remove_from_hass(self):
         self._tank.remove_callback(self.async_write_ha_state)
@@ -0,0 +1,267 @@
+import sys
+from dataclasses import dataclass, field, fields, replace, asdict
+from datetime import datetime, timezone
+from typing import Optional
+from . import decoder
+
+# The fields of the settings API, and the Settings fields their values are kept in.
+SETTINGS_FIELDS = {
+    "max_temp": "target_temperature",
+    "dsr_enabled": "dsr_enabled",
+    "frost_protection_enabled": "frost_protection_enabled",
+    "distributed_computing_enabled": "distributed_computing_enabled",
+    "cleansing_temperature": "cleansing_temperature",
+    "divert_exported_enabled": "divert_exported_enabled",
+    "pv_charge_limit": "pv_charge_limit",
+    "pv_cut_in_threshold": "pv_cut_in_threshold",
+    "pv_target_current": "pv_target_current",
+    "pv_over_temperature": "pv_over_temperature",
+}
+
+# Tanks without a PV diverter don't return these, so they keep whatever value they had.
+OPTIONAL_SETTINGS = ("divert_exported_enabled", "pv_charge_limit", "pv_cut_in_threshold", "pv_target_current", "pv_over_temperature")
+
+@dataclass(frozen=True, slots=True)
+class HeatingState:
+    """What a tank's heating is doing, from the state embedded in its measurement."""
+
+    target_charge: float = 0
+    indirect_heat_source: bool = False
+    electric_heat_source: bool = False
+    heatpump_heat_source: bool = False
+    in_holiday_mode: bool = False
+
+    @classmethod
+    def from_json(cls, state_json):
+
+        current = decoder.loads(state_json)["current"]
+
+        indirect_heat_source = False
+        electric_heat_source = False
+        heatpump_heat_source = False
+
+        # Source is only present when vacation is enabled it seems
+        in_holiday_mode = current.get("source") == "Vacation"
+
+        # Assume it's all off when the tank is in holiday mode.
+        if not in_holiday_mode:
+            heat_source = current["heat_source"].lower()
+            heat_source_on = current["immersion"].lower() == "on"
+
+            if heat_source == "indirect":
+                indirect_heat_source = heat_source_on
+            elif heat_source == "electric":
+                electric_heat_source = heat_source_on
+            elif heat_source == "heatpump":
+                heatpump_heat_source = heat_source_on
+
+        return cls(
+            target_charge=current.get("target", 0),
+            indirect_heat_source=indirect_heat_source,
+            electric_heat_source=electric_heat_source,
+            heatpump_heat_source=heatpump_heat_source,
+            in_holiday_mode=in_holiday_mode,
+        )
+
+@dataclass(frozen=True, slots=True)
+class Measurement:
+    """The latest measurement reported by a tank.
+
+    The heating state is embedded in the measurement as a JSON string. It's only decoded when one of its values
+    is first read, and not at all if it's the same string as in the previous measurement.
+    """
+
+    hot_water_temperature: float = -1
+    coldest_water_temperature: float = -1
+    charge: float = -1
+    pv_power: float = 0
+    clamp_power: float = 0
+    state_json: Optional[str] = None
+    heating_state: Optional[HeatingState] = field(default=None, compare=False, repr=False)
+
+    @classmethod
+    def from_json(cls, tank_result, previous: "Measurement" = None):
+
+        state_json = tank_result["state"]
+
+        # Only reuse a heating state that was decoded from the same string (not one that was written optimistically).
+        heating_state = previous.heating_state if previous is not None and previous.state_json == state_json else None
+
+        return cls(
+            hot_water_temperature=tank_result["topTemperature"],
+            coldest_water_temperature=tank_result["bottomTemperature"],
+            charge=tank_result["charge"],
+            pv_power=tank_result["pvEnergy"] / 60000 if "pvEnergy" in tank_result else 0,
+            clamp_power=tank_result.get("clampPower", 0),
+            state_json=state_json,
+            heating_state=heating_state,
+        )
+
+    @property
+    def heating(self) -> HeatingState:
+
+        if self.heating_state is None:
+            heating_state = HeatingState.from_json(self.state_json) if self.state_json is not None else HeatingState()
+
+            # The decoded state is a cache of state_json, so setting it doesn't really change the measurement.
+            object.__setattr__(self, "heating_state", heating_state)
+
+        return self.heating_state
+
+    def as_dict(self):
+        return {
+            "hot_water_temperature": self.hot_water_temperature,
+            "coldest_water_temperature": self.coldest_water_temperature,
+            "charge": self.charge,
+            "pv_power": self.pv_power,
+            "clamp_power": self.clamp_power,
+            "state_json": self.state_json,
+            "heating": asdict(self.heating),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            hot_water_temperature=data["hot_water_temperature"],
+            coldest_water_temperature=data["coldest_water_temperature"],
+            charge=data["charge"],
+            pv_power=data["pv_power"],
+            clamp_power=data["clamp_power"],
+            state_json=data["state_json"],
+            heating_state=HeatingState(**data["heating"]),
+        )
+
+    def with_target_charge(self, target_charge):
+        """Returns a copy with a target charge that was written, rather than reported."""
+        return replace(self, state_json=None, heating_state=replace(self.heating, target_charge=target_charge))
+
+    @property
+    def target_charge(self):
+        return self.heating.target_charge
+
+    @property
+    def indirect_heat_source(self):
+        return self.heating.indirect_heat_source
+
+    @property
+    def electric_heat_source(self):
+        return self.heating.electric_heat_source
+
+    @property
+    def heatpump_heat_source(self):
+        return self.heating.heatpump_heat_source
+
+    @property
+    def in_holiday_mode(self):
+        return self.heating.in_holiday_mode
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """A tank's settings."""
+
+    target_temperature: int = -1
+    dsr_enabled: bool = False
+    frost_protection_enabled: bool = False
+    distributed_computing_enabled: bool = False
+    cleansing_temperature: int = 0
+    divert_exported_enabled: bool = False
+    pv_charge_limit: int = 0
+    pv_cut_in_threshold: int = 0
+    pv_target_current: float = 0
+    pv_over_temperature: int = 0
+
+    @classmethod
+    def from_json(cls, json_object, previous: "Settings"):
+
+        values = {name: json_object[api_field] for api_field, name in SETTINGS_FIELDS.items() if name not in OPTIONAL_SETTINGS}
+
+        for name in OPTIONAL_SETTINGS:
+            values[name] = json_object.get(name, getattr(previous, name))
+
+        return cls(**values)
+
+    def as_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def with_api_fields(self, payload):
+        """Returns a copy with the values from a settings API payload applied."""
+        return replace(self, **{SETTINGS_FIELDS[api_field]: value for api_field, value in payload.items()})
+
+@dataclass(frozen=True, slots=True)
+class Schedule:
+    """A tank's schedule, as returned by the API, and the values the entities read from it."""
+
+    raw: Optional[dict] = None
+    holiday_date_start: Optional[datetime] = None
+    holiday_date_end: Optional[datetime] = None
+    default_heat_source: Optional[str] = None
+
+    @classmethod
+    def from_json(cls, json_object):
+
+        holiday = json_object.get("holiday") or {}
+
+        return cls(
+            raw=json_object,
+            holiday_date_start=_from_millis(holiday.get("departDate")),
+            holiday_date_end=_from_millis(holiday.get("returnDate")),
+            default_heat_source=json_object.get("defaultHeatSource"),
+        )
+
+def _from_millis(value):
+    return datetime.fromtimestamp(value / 1000, timezone.utc) if value is not None else None
+
+@dataclass(frozen=True, slots=True)
+class TankState:
+    """Everything fetched from a tank, replaced as a whole whenever any part of it changes.
+
+    The parts are never changed in place, so anything holding a TankState always sees a consistent set of values.
+    """
+
+    measurement: Measurement = field(default_factory=Measurement)
+    settings: Settings = field(default_factory=Settings)
+    schedule: Schedule = field(default_factory=Schedule)
+
+    def replace(self, **changes):
+        return replace(self, **changes)
+
+    def as_dict(self):
+        return {
+            "measurement": self.measurement.as_dict(),
+            "settings": self.settings.as_dict(),
+            "schedule": self.schedule.raw,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            measurement=Measurement.from_dict(data["measurement"]),
+            settings=Settings.from_dict(data["settings"]),
+            schedule=Schedule.from_json(data["schedule"]) if data["schedule"] is not None else Schedule(),
+        )
+
+    def memory_size(self):
+        """Returns the approximate number of bytes used by this state, including everything it refers to."""
+        return _sizeof(self, set())
+
+def _sizeof(obj, seen):
+
+    if id(obj) in seen:
+        return 0
+
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj, dict):
+        size += sum(_sizeof(key, seen) + _sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dataclass_fields__"):
+        size += sum(_sizeof(getattr(obj, f.name), seen) for f in fields(obj))
+
+    return size
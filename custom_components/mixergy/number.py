@@ -33,6 +33,8 @@ class NumberEntityBase(MixergyEntityBase, NumberEntity):
 
 class TargetTemperatureSensor(NumberEntityBase):
 
+    inputs = ("target_temperature",)
+
     native_max_value = 55
     native_min_value = 45
     native_step = 1
@@ -59,6 +61,8 @@ class TargetTemperatureSensor(NumberEntityBase):
 
 class TargetChargeSensor(NumberEntityBase):
 
+    inputs = ("target_charge",)
+
     native_max_value = 100
     native_min_value = 0
     native_step = 1
@@ -88,6 +92,8 @@ class TargetChargeSensor(NumberEntityBase):
 
 class CleansingTemperatureSensor(NumberEntityBase):
 
+    inputs = ("cleansing_temperature",)
+
     native_max_value = 55
     native_min_value = 51
     native_step = 1
@@ -114,6 +120,8 @@ class CleansingTemperatureSensor(NumberEntityBase):
 
 class PVCutInThreshold(NumberEntityBase):
 
+    inputs = ("pv_cut_in_threshold", "has_pv_diverter")
+
     native_max_value = 500
     native_min_value = 0
     native_step = 50
@@ -146,6 +154,8 @@ class PVCutInThreshold(NumberEntityBase):
 
 class PVChargeLimitSensor(NumberEntityBase):
 
+    inputs = ("pv_charge_limit", "has_pv_diverter")
+
     native_max_value = 100
     native_min_value = 0
     native_step = 10
@@ -178,6 +188,8 @@ class PVChargeLimitSensor(NumberEntityBase):
 
 class PVTargetCurrent(NumberEntityBase):
 
+    inputs = ("pv_target_current", "has_pv_diverter")
+
     native_max_value = 0
     native_min_value = -1
     native_step = 0.1
@@ -210,6 +222,8 @@ class PVTargetCurrent(NumberEntityBase):
 
 class PVOverTemperature(NumberEntityBase):
 
+    inputs = ("pv_over_temperature", "has_pv_diverter")
+
     native_max_value = 60
     native_min_value = 45
     native_step = 1
@@ -0,0 +1,166 @@
+import logging
+import asyncio
+import hashlib
+import random
+import time
+from functools import partial
+from homeassistant import core
+from homeassistant.helpers.event import async_call_later
+from .const import MEASUREMENT_REFRESH_INTERVAL, MAX_CONCURRENT_TANK_POLLS, POLL_JITTER, RECENT_WRITE_WINDOW
+
+_LOGGER = logging.getLogger(__name__)
+
+# Slot times within this many seconds of each other are the same slot.
+SLOT_TOLERANCE = 0.001
+
+def _slot_key(serial_number):
+    # Order tanks by a hash of their serial number, so each one keeps the same slot across restarts.
+    return hashlib.sha1(serial_number.encode()).hexdigest()
+
+class AdaptivePollPolicy:
+    """Picks how often to poll a tank from what it's doing.
+
+    Tanks are polled quickly while they're heating or have just been changed, and slowly while they're on
+    holiday or their charge isn't moving. Otherwise they're polled at the usual measurement interval. While
+    the measurement can't be fetched, the interval backs off exponentially from the fast one. Once it's known
+    how often the tank reports a new measurement, it's never polled faster than that.
+    """
+
+    def __init__(self, fast_interval, slow_interval):
+        self.fast_interval = fast_interval
+        self.slow_interval = slow_interval
+
+    def interval(self, tank):
+
+        # Back off while the tank's measurement can't be fetched, up to the slow interval. The settings and
+        # schedule failing doesn't make polling the measurement any less worthwhile.
+        if tank.measurement_failures:
+            return min(self.fast_interval * 2 ** tank.measurement_failures, self.slow_interval)
+
+        if tank.is_heating or tank.seconds_since_write < RECENT_WRITE_WINDOW.total_seconds():
+            interval = self.fast_interval
+        elif tank.in_holiday_mode or tank.charge_is_flat:
+            return self.slow_interval
+        else:
+            interval = min(max(MEASUREMENT_REFRESH_INTERVAL.total_seconds(), self.fast_interval), self.slow_interval)
+
+        # There's no point polling faster than the tank reports.
+        reporting_interval = tank.reporting_interval
+
+        if reporting_interval is not None:
+            interval = min(max(interval, reporting_interval), self.slow_interval)
+
+        return interval
+
+class AccountPoller:
+    """Schedules the refreshes of every tank on an account.
+
+    The Mixergy API has no bulk measurement endpoint, so each tank's coordinator is refreshed on its own,
+    with a cap on how many run at once. Rather than refreshing every tank in the same second, the tanks are
+    spread evenly across the interval in a fixed order, with a little jitter. The coordinators have no
+    interval of their own; this drives them, and each refresh notifies that tank's entities as usual.
+
+    How long the interval is depends on each tank's AdaptivePollPolicy, so a tank's slot is kept as a
+    fraction of its interval.
+    """
+
+    def __init__(self, hass):
+        self._hass = hass
+        self._coordinators = {}
+        self._tanks = {}
+        self._policies = {}
+        self._offsets = {}
+        self._pending = {}
+        self._slot_at = {}
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_TANK_POLLS)
+        self._anchor = time.monotonic()
+
+    @property
+    def tank_count(self):
+        return len(self._coordinators)
+
+    @core.callback
+    def add_tank(self, tank, coordinator, policy: AdaptivePollPolicy):
+
+        serial_number = tank.serial_number
+
+        self._coordinators[serial_number] = coordinator
+        self._tanks[serial_number] = tank
+        self._policies[serial_number] = policy
+
+        self._async_respace()
+
+    @core.callback
+    def remove_tank(self, serial_number):
+
+        self._coordinators.pop(serial_number, None)
+        self._tanks.pop(serial_number, None)
+        self._policies.pop(serial_number, None)
+        self._slot_at.pop(serial_number, None)
+
+        self._async_cancel(serial_number)
+
+        self._async_respace()
+
+    @core.callback
+    def async_tank_written(self, serial_number):
+        """Called after a write, so the tank is polled at its (probably faster) new interval straight away."""
+
+        if serial_number in self._coordinators:
+            self._async_schedule(serial_number)
+
+    @core.callback
+    def _async_respace(self):
+
+        ordered = sorted(self._coordinators, key=_slot_key)
+
+        self._offsets = {serial_number: i / len(ordered) for i, serial_number in enumerate(ordered)}
+
+        for serial_number in ordered:
+            self._async_schedule(serial_number)
+
+    @core.callback
+    def _async_cancel(self, serial_number):
+
+        cancel = self._pending.pop(serial_number, None)
+
+        if cancel is not None:
+            cancel()
+
+    @core.callback
+    def _async_schedule(self, serial_number, after_refresh=False):
+
+        self._async_cancel(serial_number)
+
+        interval = self._policies[serial_number].interval(self._tanks[serial_number])
+
+        now = time.monotonic()
+
+        delay = (self._offsets[serial_number] * interval - (now - self._anchor)) % interval
+
+        # Having just polled, the next slot is normally the one after the slot we polled in. The refresh can
+        # finish right on a slot boundary though, so make sure it isn't the same one again.
+        if after_refresh and now + delay <= self._slot_at.get(serial_number, float("-inf")) + SLOT_TOLERANCE:
+            delay += interval
+
+        self._slot_at[serial_number] = now + delay
+
+        delay += random.uniform(0, POLL_JITTER.total_seconds())
+
+        self._pending[serial_number] = async_call_later(self._hass, delay, partial(self._async_refresh, serial_number))
+
+    async def _async_refresh(self, serial_number, _now):
+
+        self._pending.pop(serial_number, None)
+
+        coordinator = self._coordinators.get(serial_number)
+
+        if coordinator is None:
+            return
+
+        async with self._semaphore:
+            await coordinator.async_refresh()
+
+        # The tank may have been removed while it was refreshing.
+        if serial_number in self._coordinators:
+            self._async_schedule(serial_number, after_refresh=True)
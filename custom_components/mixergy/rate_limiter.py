@@ -0,0 +1,162 @@
+import logging
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from homeassistant import core, exceptions
+from .const import DOMAIN, RATE_LIMIT, RATE_LIMIT_BURST, MAX_CONCURRENT_REQUESTS, BACKGROUND_MAX_WAIT
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_RATE_LIMITER = f"{DOMAIN}_rate_limiter"
+
+# Lower numbers go first.
+PRIORITY_USER = 0
+PRIORITY_BACKGROUND = 1
+
+class RateLimitedError(exceptions.HomeAssistantError):
+    """Error to indicate a request was dropped because it waited too long for the rate limiter."""
+
+@core.callback
+def async_get_rate_limiter(hass):
+    """Returns the rate limiter shared by every Mixergy account and tank."""
+
+    limiter = hass.data.get(DATA_RATE_LIMITER)
+
+    if limiter is None:
+        limiter = RateLimiter(RATE_LIMIT, RATE_LIMIT_BURST, MAX_CONCURRENT_REQUESTS, BACKGROUND_MAX_WAIT)
+        hass.data[DATA_RATE_LIMITER] = limiter
+
+    return limiter
+
+class RateLimiter:
+    """A token bucket, with priorities, in front of every request to the Mixergy API.
+
+    Requests take a token each, and tokens refill at a fixed rate up to a burst size. When requests have to
+    wait, user-initiated ones are let through before background polls. Background requests that would wait
+    longer than the max wait are dropped. A request also needs one of a fixed number of slots while it's
+    sent and its response headers are received, which caps how many are in flight at once.
+    """
+
+    def __init__(self, rate, burst, max_concurrent, max_wait):
+        self._rate = rate
+        self._burst = burst
+        self._max_wait = max_wait.total_seconds()
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._waiters = []
+        self._order = itertools.count()
+        self._dispatch_handle = None
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.acquired = 0
+        self.dropped = 0
+        self.total_wait = 0.0
+
+    @property
+    def average_wait(self):
+        if not self.acquired:
+            return None
+
+        return self.total_wait / self.acquired
+
+    @property
+    def queued(self):
+        return sum(1 for _, _, waiter in self._waiters if not waiter.done())
+
+    @asynccontextmanager
+    async def acquire(self, priority, max_wait=None):
+        """Waits for a token and a slot. max_wait, in seconds, caps the wait for any request (e.g. to keep it
+        within its budget), on top of the max wait for background requests."""
+
+        started_at = time.monotonic()
+
+        if priority != PRIORITY_USER:
+            max_wait = self._max_wait if max_wait is None else min(max_wait, self._max_wait)
+
+        await self._async_take_token(priority, max_wait)
+
+        if max_wait is None:
+            await self._slots.acquire()
+        else:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), max(0, max_wait - (time.monotonic() - started_at)))
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                raise RateLimitedError(f"Dropped a request after waiting {max_wait:.1f}s for the rate limiter") from None
+
+        try:
+            wait = time.monotonic() - started_at
+
+            self.acquired += 1
+            self.total_wait += wait
+
+            if wait > 1:
+                _LOGGER.debug("Waited %.1fs for the rate limiter", wait)
+
+            yield
+        finally:
+            self._slots.release()
+
+    async def _async_take_token(self, priority, max_wait):
+
+        self._refill()
+
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+
+        heapq.heappush(self._waiters, (priority, next(self._order), waiter))
+
+        self._schedule_dispatch()
+
+        if max_wait is None:
+            await waiter
+            return
+
+        try:
+            await asyncio.wait_for(waiter, max_wait)
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            raise RateLimitedError(f"Dropped a request after waiting {max_wait:.1f}s for the rate limiter") from None
+
+    def _refill(self):
+
+        now = time.monotonic()
+
+        self._tokens = min(self._burst, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+    def _schedule_dispatch(self):
+
+        if self._dispatch_handle is not None:
+            return
+
+        delay = max(0, (1 - self._tokens) / self._rate)
+
+        self._dispatch_handle = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def _dispatch(self):
+
+        self._dispatch_handle = None
+
+        self._refill()
+
+        while self._waiters and self._tokens >= 1:
+            _, _, waiter = heapq.heappop(self._waiters)
+
+            # Waiters that timed out, or were cancelled, don't need a token.
+            if waiter.done():
+                continue
+
+            waiter.set_result(None)
+            self._tokens -= 1
+
+        # Clear out any abandoned waiters, so they don't keep the dispatcher running.
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+
+        if self._waiters:
+            self._schedule_dispatch()
@@ -0,0 +1,62 @@
+import hashlib
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+class CachedResponse:
+
+    __slots__ = ("etag", "last_modified", "body_hash")
+
+    def __init__(self, etag, last_modified, body_hash):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body_hash = body_hash
+
+class ResponseCache:
+    """Remembers the validators of the responses we've seen, keyed by URL, so unchanged bodies can be skipped."""
+
+    def __init__(self):
+        self._entries = {}
+
+    def conditional_headers(self, url):
+
+        entry = self._entries.get(url)
+
+        if entry is None:
+            return {}
+
+        headers = {}
+
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        return headers
+
+    def etag(self, url):
+
+        entry = self._entries.get(url)
+
+        return entry.etag if entry is not None else None
+
+    def store(self, url, response_headers, body: bytes):
+        """Records the response and returns True if the body differs from the one last seen at this URL."""
+
+        # Not every endpoint sends an ETag or Last-Modified header, so we always hash the body as well.
+        # That way an identical body can still be skipped.
+        body_hash = hashlib.sha1(body).hexdigest()
+
+        previous = self._entries.get(url)
+
+        self._entries[url] = CachedResponse(response_headers.get("ETag"), response_headers.get("Last-Modified"), body_hash)
+
+        if previous is not None and previous.body_hash == body_hash:
+            _LOGGER.debug("Response from %s is unchanged", url)
+            return False
+
+        return True
+
+    def invalidate(self, url):
+        self._entries.pop(url, None)
@@ -0,0 +1,50 @@
+import copy
+from datetime import datetime
+
+class ScheduleTransaction:
+    """A batch of changes to a tank's schedule, written together with one PUT.
+
+    The changes are recorded rather than applied straight away, so they can be applied to whichever version
+    of the schedule is current when the transaction is committed, and again to a newer one if the schedule
+    turns out to have been changed by someone else in the meantime.
+    """
+
+    def __init__(self, tank):
+        self._tank = tank
+        self._edits = {}
+
+    def set_holiday_dates(self, start_date: datetime, end_date: datetime):
+        self._edits["holiday"] = {
+            "departDate": int(start_date.timestamp()) * 1000,
+            "returnDate": int(end_date.timestamp()) * 1000
+        }
+        return self
+
+    def clear_holiday_dates(self):
+        self._edits["holiday"] = None
+        return self
+
+    def set_default_heat_source(self, heat_source):
+        self._edits["defaultHeatSource"] = heat_source
+        return self
+
+    def merge(self, other: "ScheduleTransaction"):
+        """Adds another transaction's changes to this one. Where both change the same thing, the other's wins."""
+        self._edits.update(other._edits)
+        return self
+
+    def apply(self, schedule: dict) -> dict:
+        """Returns a copy of the schedule with the changes applied."""
+
+        schedule = copy.deepcopy(schedule)
+
+        for field, value in self._edits.items():
+            if value is None:
+                schedule.pop(field, None)
+            else:
+                schedule[field] = copy.deepcopy(value)
+
+        return schedule
+
+    async def commit(self):
+        await self._tank.commit_schedule(self)
@@ -1,6 +1,6 @@
 import logging
 from datetime import timedelta
-from homeassistant.const import UnitOfPower, UnitOfTemperature, PERCENTAGE, STATE_OFF
+from homeassistant.const import UnitOfPower, UnitOfTemperature, PERCENTAGE, STATE_OFF, EntityCategory
 from homeassistant.core import HomeAssistant
 from homeassistant.components.sensor import SensorDeviceClass, SensorEntity
 from homeassistant.components.integration.sensor import IntegrationSensor
@@ -40,6 +40,12 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
     new_entities.append(HolidayStartDateSensor(coordinator, tank))
     new_entities.append(HolidayEndDateSensor(coordinator, tank))
     new_entities.append(DefaultHeatSourceSensor(coordinator, tank))
+    new_entities.append(ConnectionsCreatedSensor(coordinator, tank))
+    new_entities.append(ConnectionsReusedSensor(coordinator, tank))
+    new_entities.append(MeasurementFetchedSensor(coordinator, tank))
+    new_entities.append(SettingsFetchedSensor(coordinator, tank))
+    new_entities.append(ScheduleFetchedSensor(coordinator, tank))
+    new_entities.append(ConsecutiveFailuresSensor(coordinator, tank))
 
     async_add_entities(new_entities)
 
@@ -55,6 +61,8 @@ class BinarySensorBase(MixergyEntityBase, BinarySensorEntity):
 
 class ChargeSensor(SensorBase):
 
+    inputs = ("charge",)
+
     def __init__(self, coordinator, tank:Tank):
         super().__init__(coordinator, tank)
 
@@ -80,6 +88,8 @@ class ChargeSensor(SensorBase):
 
 class TargetChargeSensor(SensorBase):
 
+    inputs = ("target_charge",)
+
     def __init__(self, coordinator, tank:Tank):
         super().__init__(coordinator, tank)
 
@@ -105,6 +115,8 @@ class TargetChargeSensor(SensorBase):
 
 class HotWaterTemperatureSensor(SensorBase):
 
+    inputs = ("hot_water_temperature",)
+
     device_class = SensorDeviceClass.TEMPERATURE
 
     def __init__(self, coordinator, tank:Tank):
@@ -129,6 +141,8 @@ class HotWaterTemperatureSensor(SensorBase):
 
 class ColdestWaterTemperatureSensor(SensorBase):
 
+    inputs = ("coldest_water_temperature",)
+
     device_class = SensorDeviceClass.TEMPERATURE
 
     def __init__(self, coordinator, tank:Tank):
@@ -152,6 +166,8 @@ class ColdestWaterTemperatureSensor(SensorBase):
 
 class TargetTemperatureSensor(SensorBase):
 
+    inputs = ("target_temperature",)
+
     device_class = SensorDeviceClass.TEMPERATURE
 
     def __init__(self, coordinator, tank:Tank):
@@ -175,6 +191,8 @@ class TargetTemperatureSensor(SensorBase):
 
 class IndirectHeatSensor(BinarySensorBase):
 
+    inputs = ("indirect_heat_source",)
+
     device_class = BinarySensorDeviceClass.HEAT
 
     def __init__(self, coordinator, tank:Tank):
@@ -198,6 +216,8 @@ class IndirectHeatSensor(BinarySensorBase):
 
 class ElectricHeatSensor(BinarySensorBase):
 
+    inputs = ("electic_heat_source",)
+
     device_class = SensorDeviceClass.ENERGY
 
     def __init__(self, coordinator, tank:Tank):
@@ -218,6 +238,8 @@ class ElectricHeatSensor(BinarySensorBase):
 
 class HeatPumpHeatSensor(BinarySensorBase):
 
+    inputs = ("heatpump_heat_source",)
+
     device_class = SensorDeviceClass.ENERGY
 
     def __init__(self, coordinator, tank:Tank):
@@ -238,6 +260,8 @@ class HeatPumpHeatSensor(BinarySensorBase):
 
 class NoChargeSensor(BinarySensorBase):
 
+    inputs = ("no_charge",)
+
     def __init__(self, coordinator, tank:Tank):
         super().__init__( coordinator, tank)
         self._state = STATE_OFF
@@ -248,7 +272,7 @@ class NoChargeSensor(BinarySensorBase):
 
     @property
     def is_on(self):
-        return self._tank.charge < 0.5
+        return self._tank.no_charge
 
     @property
     def icon(self):
@@ -260,6 +284,8 @@ class NoChargeSensor(BinarySensorBase):
 
 class LowChargeSensor(BinarySensorBase):
 
+    inputs = ("low_charge",)
+
     def __init__(self, coordinator, tank:Tank):
         super().__init__( coordinator, tank)
         self._state = STATE_OFF
@@ -270,7 +296,7 @@ class LowChargeSensor(BinarySensorBase):
 
     @property
     def is_on(self):
-        return self._tank.charge < 5
+        return self._tank.low_charge
 
     @property
     def icon(self):
@@ -282,6 +308,8 @@ class LowChargeSensor(BinarySensorBase):
 
 class IsChargingSensor(BinarySensorBase):
 
+    inputs = ("target_charge",)
+
     def __init__(self, coordinator, tank:Tank):
         super().__init__( coordinator, tank)
         self._state = STATE_OFF
@@ -304,6 +332,8 @@ class IsChargingSensor(BinarySensorBase):
 
 class PowerSensor(SensorBase):
 
+    inputs = ("electic_heat_source",)
+
     device_class = SensorDeviceClass.POWER
     state_class = "measurement"
 
@@ -348,6 +378,8 @@ class EnergySensor(IntegrationSensor):
 
 class PVPowerSensor(SensorBase):
 
+    inputs = ("pv_power", "has_pv_diverter")
+
     device_class = SensorDeviceClass.POWER
     state_class = "measurement"
 
@@ -401,6 +433,8 @@ class PVEnergySensor(IntegrationSensor):
 
 class ClampPowerSensor(SensorBase):
 
+    inputs = ("clamp_power", "has_pv_diverter")
+
     device_class = SensorDeviceClass.POWER
     state_class = "measurement"
 
@@ -430,6 +464,8 @@ class ClampPowerSensor(SensorBase):
 
 class HolidayModeSensor(BinarySensorBase):
 
+    inputs = ("in_holiday_mode",)
+
     def __init__(self, coordinator, tank:Tank):
         super().__init__( coordinator, tank)
         self._state = STATE_OFF
@@ -452,6 +488,8 @@ class HolidayModeSensor(BinarySensorBase):
 
 class HolidayStartDateSensor(SensorBase):
 
+    inputs = ("holiday_date_start",)
+
     device_class = SensorDeviceClass.TIMESTAMP
 
     def __init__(self, coordinator, tank:Tank):
@@ -472,6 +510,8 @@ class HolidayStartDateSensor(SensorBase):
 
 class HolidayEndDateSensor(SensorBase):
 
+    inputs = ("holiday_date_end",)
+
     device_class = SensorDeviceClass.TIMESTAMP
 
     def __init__(self, coordinator, tank:Tank):
@@ -492,6 +532,8 @@ class HolidayEndDateSensor(SensorBase):
 
 class DefaultHeatSourceSensor(SensorBase):
 
+    inputs = ("default_heat_source",)
+
     device_class = SensorDeviceClass.ENUM
 
     def __init__(self, coordinator, tank:Tank):
@@ -509,3 +551,166 @@ class DefaultHeatSourceSensor(SensorBase):
     @property
     def name(self):
         return f"Default Heat Source"
+
+class ConnectionsCreatedSensor(SensorBase):
+
+    inputs = ("connections_created",)
+
+    entity_category = EntityCategory.DIAGNOSTIC
+    state_class = "total_increasing"
+
+    def __init__(self, coordinator, tank:Tank):
+        super().__init__(coordinator,tank)
+
+    @property
+    def unique_id(self):
+        return f"mixergy_{self._tank.tank_id}_connections_created"
+
+    @property
+    def state(self):
+        return self._tank.connections_created
+
+    @property
+    def icon(self):
+        return "mdi:lan-connect"
+
+    @property
+    def name(self):
+        return f"Connections Opened"
+
+class ConnectionsReusedSensor(SensorBase):
+
+    inputs = ("connections_reused",)
+
+    entity_category = EntityCategory.DIAGNOSTIC
+    state_class = "total_increasing"
+
+    def __init__(self, coordinator, tank:Tank):
+        super().__init__(coordinator,tank)
+
+    @property
+    def unique_id(self):
+        return f"mixergy_{self._tank.tank_id}_connections_reused"
+
+    @property
+    def state(self):
+        return self._tank.connections_reused
+
+    @property
+    def icon(self):
+        return "mdi:lan-pending"
+
+    @property
+    def name(self):
+        return f"Connections Reused"
+
+class MeasurementFetchedSensor(SensorBase):
+
+    inputs = ("measurement_fetched_at",)
+
+    device_class = SensorDeviceClass.TIMESTAMP
+    entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, coordinator, tank:Tank):
+        super().__init__(coordinator,tank)
+
+    @property
+    def unique_id(self):
+        return f"mixergy_{self._tank.tank_id}_measurement_fetched_at"
+
+    @property
+    def state(self):
+        return self._tank.measurement_fetched_at
+
+    @property
+    def available(self):
+        # Shows how old the data is, so it's most useful when the rest of the tank isn't available.
+        return True
+
+    @property
+    def name(self):
+        return f"Measurement Fetched"
+
+class SettingsFetchedSensor(SensorBase):
+
+    inputs = ("settings_fetched_at",)
+
+    device_class = SensorDeviceClass.TIMESTAMP
+    entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, coordinator, tank:Tank):
+        super().__init__(coordinator,tank)
+
+    @property
+    def unique_id(self):
+        return f"mixergy_{self._tank.tank_id}_settings_fetched_at"
+
+    @property
+    def state(self):
+        return self._tank.settings_fetched_at
+
+    @property
+    def available(self):
+        # Shows how old the data is, so it's most useful when the rest of the tank isn't available.
+        return True
+
+    @property
+    def name(self):
+        return f"Settings Fetched"
+
+class ScheduleFetchedSensor(SensorBase):
+
+    inputs = ("schedule_fetched_at",)
+
+    device_class = SensorDeviceClass.TIMESTAMP
+    entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, coordinator, tank:Tank):
+        super().__init__(coordinator,tank)
+
+    @property
+    def unique_id(self):
+        return f"mixergy_{self._tank.tank_id}_schedule_fetched_at"
+
+    @property
+    def state(self):
+        return self._tank.schedule_fetched_at
+
+    @property
+    def available(self):
+        # Shows how old the data is, so it's most useful when the rest of the tank isn't available.
+        return True
+
+    @property
+    def name(self):
+        return f"Schedule Fetched"
+
+class ConsecutiveFailuresSensor(SensorBase):
+
+    inputs = ("consecutive_failures",)
+
+    entity_category = EntityCategory.DIAGNOSTIC
+    state_class = "measurement"
+
+    def __init__(self, coordinator, tank:Tank):
+        super().__init__(coordinator,tank)
+
+    @property
+    def unique_id(self):
+        return f"mixergy_{self._tank.tank_id}_consecutive_failures"
+
+    @property
+    def state(self):
+        return self._tank.consecutive_failures
+
+    @property
+    def available(self):
+        return True
+
+    @property
+    def icon(self):
+        return "mdi:alert-circle-outline"
+
+    @property
+    def name(self):
+        return f"Consecutive Fetch Failures"
@@ -0,0 +1,35 @@
+import asyncio
+
+async def wait_shared(shared):
+    """Waits for a result that's shared between several callers.
+
+    It's shielded, so one caller being cancelled (e.g. a service call timing out) doesn't cancel the shared
+    work for everyone else waiting on it.
+    """
+    return await asyncio.shield(shared)
+
+class SingleFlight:
+    """Shares one in-flight call per key between everyone who asks for it while it's running."""
+
+    def __init__(self):
+        self._in_flight = {}
+
+    async def run(self, key, factory):
+
+        task = self._in_flight.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+
+        return await wait_shared(task)
+
+    def forget(self, key):
+        """Makes the next call for this key start afresh, rather than joining the one already running."""
+        self._in_flight.pop(key, None)
+
+    def _finished(self, key, task):
+
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
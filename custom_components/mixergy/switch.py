@@ -31,6 +31,8 @@ class SwitchEntityBase(MixergyEntityBase, SwitchEntity):
 
 class DSRSwitch(SwitchEntityBase):
 
+    inputs = ("dsr_enabled",)
+
     def __init__(self, coordinator, tank:Tank):
         super().__init__(coordinator, tank)
 
@@ -54,6 +56,8 @@ class DSRSwitch(SwitchEntityBase):
 
 class FrostProtectionSwitch(SwitchEntityBase):
 
+    inputs = ("frost_protection_enabled",)
+
     def __init__(self, coordinator, tank:Tank):
         super().__init__(coordinator, tank)
 
@@ -77,6 +81,8 @@ class FrostProtectionSwitch(SwitchEntityBase):
 
 class DistributedComputingSwitch(SwitchEntityBase):
 
+    inputs = ("distributed_computing_enabled",)
+
     def __init__(self, coordinator, tank:Tank):
         super().__init__(coordinator, tank)
 
@@ -100,6 +106,8 @@ class DistributedComputingSwitch(SwitchEntityBase):
 
 class PVDivertSwitch(SwitchEntityBase):
 
+    inputs = ("divert_exported_enabled", "has_pv_diverter")
+
     def __init__(self, coordinator, tank:Tank):
         super().__init__(coordinator, tank)
 
@@ -1,14 +1,101 @@
 import logging
 import asyncio
-import json
-from datetime import datetime
+import itertools
+from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from functools import partial
+from types import MappingProxyType
 from typing import Optional
-from homeassistant.helpers import aiohttp_client
-from .const import ATTR_CHARGE
+import time
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import UpdateFailed
+from homeassistant.util import dt as dt_util
+from .response_cache import ResponseCache
+from .account import MixergyAccount
+from .write_coalescer import WriteCoalescer
+from .command_queue import CommandQueue, running_command
+from .rate_limiter import PRIORITY_USER
+from .single_flight import SingleFlight
+from .deadband import Deadband
+from .cadence import CadenceEstimator
+from .schedule_transaction import ScheduleTransaction
+from . import decoder
+from .models import TankState, Measurement, Settings, Schedule
+from .const import DOMAIN, STATE_SAVE_DELAY, CHARGE_CONFIRM_TIMEOUT, DEFAULT_STALE_AFTER, ATTR_CHARGE, SETTINGS_REFRESH_INTERVAL, SCHEDULE_REFRESH_INTERVAL, FLAT_CHARGE_POLLS, SETTINGS_WRITE_DELAY, SETTINGS_WRITE_MAX_DELAY
 
 _LOGGER = logging.getLogger(__name__)
 
-ROOT_ENDPOINT = "https://www.mixergy.io/api/v2"
+# Settings and the schedule change rarely, so they're refreshed on their own, slower, tiers.
+TIER_SETTINGS = "settings"
+TIER_SCHEDULE = "schedule"
+
+TIER_INTERVALS = {
+    TIER_SETTINGS: SETTINGS_REFRESH_INTERVAL,
+    TIER_SCHEDULE: SCHEDULE_REFRESH_INTERVAL,
+}
+
+ENDPOINT_MEASUREMENT = "measurement"
+
+# When the tank took a measurement, in milliseconds since the epoch. Used (if it's there) to spot measurements
+# we've already seen, and to learn how often the tank reports.
+MEASUREMENT_TIMESTAMP = "recordedTime"
+
+ENDPOINTS = (ENDPOINT_MEASUREMENT, TIER_SETTINGS, TIER_SCHEDULE)
+
+# Returned by _fetch_if_modified in place of a response that was overtaken by a write while it was on its way.
+# The fetch worked, there's just nothing to apply.
+SUPERSEDED = object()
+
+STATE_STORAGE_VERSION = 1
+
+# How many times a schedule change is tried again after finding the schedule was changed at the same time.
+SCHEDULE_CONFLICT_RETRIES = 1
+
+# The state entities read from the tank. Each publish takes a snapshot of these and compares it with the last
+# one, so only entities that read a field that changed are written.
+SNAPSHOT_FIELDS = (
+    "online",
+    "stale",
+    "measurement_fetched_at",
+    "settings_fetched_at",
+    "schedule_fetched_at",
+    "consecutive_failures",
+    "hot_water_temperature",
+    "coldest_water_temperature",
+    "charge",
+    "low_charge",
+    "no_charge",
+    "target_charge",
+    "indirect_heat_source",
+    "electic_heat_source",
+    "heatpump_heat_source",
+    "in_holiday_mode",
+    "target_temperature",
+    "dsr_enabled",
+    "frost_protection_enabled",
+    "distributed_computing_enabled",
+    "cleansing_temperature",
+    "pv_power",
+    "clamp_power",
+    "has_pv_diverter",
+    "divert_exported_enabled",
+    "pv_cut_in_threshold",
+    "pv_charge_limit",
+    "pv_target_current",
+    "pv_over_temperature",
+    "holiday_date_start",
+    "holiday_date_end",
+    "default_heat_source",
+    "connections_created",
+    "connections_reused",
+)
+
+def _measurement_timestamp(tank_result):
+    # The timestamp's format isn't documented, so it's only used if it looks like epoch milliseconds. Otherwise
+    # repeats are spotted by the body's hash, and the cadence learned from when measurements arrive.
+    reported_at = tank_result.get(MEASUREMENT_TIMESTAMP)
+
+    return reported_at if isinstance(reported_at, (int, float)) and not isinstance(reported_at, bool) else None
 
 class TankUrls:
     def __init__(self, account_url):
@@ -18,657 +105,1058 @@ class Tank:
 
     manufacturer = "Mixergy Ltd"
 
-    def __init__(self, hass, username, password, serial_number):
+    def __init__(self, hass, account: MixergyAccount, serial_number, optimistic_writes=True, deadbands=None, max_silence=None, stale_after=timedelta(seconds=DEFAULT_STALE_AFTER)):
         self._id = serial_number.lower()
-        self.username = username
-        self.password = password
+        self._account = account
+        self._optimistic_writes = optimistic_writes
+        self._unconfirmed_settings = {}
+        self._unconfirmed_schedule = None
+
+        # Schedule changes committed while another is waiting to be written, merged into one.
+        self._pending_schedule = None
+
+        # A target charge written optimistically, as (charge, when it was written), and the last measurement the
+        # tank reported before it.
+        self._unconfirmed_charge = None
+        self._reported_measurement = None
         self.serial_number = serial_number.upper()
         self._hass = hass
-        self._callbacks = set()
+        self._callbacks = {}
+        self._published = None
+
+        # Deadbands are given as (absolute, relative) for each field. The charge_changed event has its own, as
+        # it's fired from the raw measurement rather than when the state is published.
+        deadbands = deadbands or {}
+        self._deadbands = {field: Deadband(absolute, relative, max_silence) for field, (absolute, relative) in deadbands.items()}
+        self._charge_event_deadband = Deadband(*deadbands.get("charge", (0, 0)), max_silence)
         self._loop = asyncio.get_event_loop()
-        self._hot_water_temperature = -1
-        self._coldest_water_temperature = -1
-        self._charge = -1
-        self._target_charge = 0
-        self._indirect_heat_source = False
-        self._electric_heat_source = False
-        self._heatpump_heat_source = False
+
+        # Everything fetched from the tank. Fetches and writes build a new state and swap it in, so it's never
+        # seen half updated.
+        self._state = TankState()
+
+        # The last state is kept in a store, so it can be shown straight away when Home Assistant starts. It's
+        # stale until the tank has been fetched.
+        self._state_store = Store(hass, STATE_STORAGE_VERSION, f"{DOMAIN}.{self._id}.state")
+        self._stale = False
+        self._save_pending = False
+
+        # When each endpoint was last fetched successfully, and how many times in a row it's failed since. The
+        # tank is only available while its measurement is younger than stale_after.
+        self._stale_after = stale_after
+        self._last_success = {}
+        self._consecutive_failures = {}
         self._hasFetched = False
-        self._token = ""
+        self._control_url = ""
+        self._settings_url = ""
+        self._schedule_url = ""
+        self.modelCode = ""
+        self.firmwareVersion = "0.0.0"
         self._latest_measurement_url = ""
         self.model = ""
         self.firmware_version = "0.0.0"
-        self._target_temperature = -1
-        self._dsr_enabled = False
-        self._frost_protection_enabled = False
-        self._distributed_computing_enabled = False
-        self._cleansing_temperature = 0
-        self._in_holiday_mode = False
-        self._pv_power = 0
-        self._clamp_power = 0
         self._has_pv_diverter = False
-        self._divert_exported_enabled = False
-        self._pv_cut_in_threshold = 0
-        self._pv_charge_limit = 0
-        self._pv_target_current = 0
-        self._pv_over_temperature = 0
-        self._schedule = None
+        self._tier_refreshed_at = {}
+        self._last_write_at = None
+        self._unchanged_charge_polls = 0
+
+        # Which measurement we last processed, and how often the tank reports a new one.
+        self._measurement_reported_at = None
+        self._polls_since_measurement = 0
+        self._cadence = CadenceEstimator()
+        self.repeated_measurements = 0
+
+        # Settings written in quick succession (e.g. while dragging a slider) are sent as one PUT, followed by
+        # a single refresh.
+        self._settings_writer = WriteCoalescer(hass, self._queue_settings, SETTINGS_WRITE_DELAY, SETTINGS_WRITE_MAX_DELAY)
+
+        # Every write goes through this queue, so they reach the API in the order they were made.
+        self._commands = CommandQueue(hass)
+        self._response_cache = ResponseCache()
+
+        # Concurrent fetches of the same endpoint share one request, and every request is numbered so that a
+        # response can't overwrite state that's newer than it.
+        self._single_flight = SingleFlight()
+        self._sequence = itertools.count(1)
+        self._applied_sequence = {}
 
     @property
     def tank_id(self):
         return self._id
 
+    def invalidate(self, tier):
+        self._tier_refreshed_at.pop(tier, None)
+
+    def _tier_due(self, tier):
+        refreshed_at = self._tier_refreshed_at.get(tier)
+
+        if refreshed_at is None:
+            return True
+
+        return time.monotonic() - refreshed_at >= TIER_INTERVALS[tier].total_seconds()
+
+    def _mark_refreshed(self, tier):
+        self._tier_refreshed_at[tier] = time.monotonic()
+
+    def _written(self):
+        self._last_write_at = time.monotonic()
+        self._account.poller.async_tank_written(self.serial_number)
+
     async def test_authentication(self):
-        return await self.authenticate()
+        return await self._account.authenticate()
 
     async def test_connection(self):
         return await self.fetch_tank_information()
     
     async def set_target_charge(self, charge):
 
-        session = aiohttp_client.async_get_clientsession(self._hass, verify_ssl=False)
+        await self._commands.submit("charge", partial(self._set_target_charge, charge))
 
-        headers = {'Authorization': f'Bearer {self._token}'}
+    async def _set_target_charge(self, charge):
 
-        async with session.put(self._control_url, headers=headers, json={'charge': charge }) as resp:
+        async with self._request("PUT", self._control_url, json={'charge': charge }) as resp:
 
             if resp.status != 200:
                 _LOGGER.error("Call to %s to set the desired charge failed with status %i", self._control_url, resp.status)
                 return
 
-            await self.fetch_last_measurement()
+        self._written()
+        self._state_written(ENDPOINT_MEASUREMENT)
 
-    async def set_target_temperature(self, temperature):
+        if self._optimistic_writes:
+            # The tank reports less often than we poll, so keep showing the written target until a measurement
+            # taken after the write arrives, rather than flipping back to the one it reported before.
+            if self._unconfirmed_charge is None:
+                self._reported_measurement = self._state.measurement
 
-        session = aiohttp_client.async_get_clientsession(self._hass, verify_ssl=False)
+            self._unconfirmed_charge = (charge, time.time())
+            self._state = self._state.replace(measurement=self._state.measurement.with_target_charge(charge))
+            await self.publish_updates()
+            return
 
-        headers = {'Authorization': f'Bearer {self._token}'}
+        await self.fetch_last_measurement()
 
-        async with session.put(self._settings_url, headers=headers, json={'max_temp': temperature }) as resp:
+        # The entities aren't polled, so nothing else would show the refetched measurement until the next poll.
+        await self.publish_updates()
 
-            if resp.status != 200:
-                _LOGGER.error("Call to %s to set the target temperature failed with status %i", self._settings_url, resp.status)
-                return
+    async def set_target_temperature(self, temperature):
 
-            await self.fetch_settings()
+        await self._settings_writer.write({'max_temp': temperature })
 
     async def set_dsr_enabled(self, enabled):
 
-        session = aiohttp_client.async_get_clientsession(self._hass, verify_ssl=False)
+        await self._settings_writer.write({'dsr_enabled': enabled })
 
-        headers = {'Authorization': f'Bearer {self._token}'}
+    async def set_frost_protection_enabled(self, enabled):
 
-        async with session.put(self._settings_url, headers=headers, json={'dsr_enabled': enabled }) as resp:
+        await self._settings_writer.write({'frost_protection_enabled': enabled })
 
-            if resp.status != 200:
-                _LOGGER.error("Call to %s to set dsr (grid assistance) enabled failed with status %i", self._settings_url, resp.status)
-                return
+    async def set_distributed_computing_enabled(self, enabled):
 
-            await self.fetch_settings()
+        await self._settings_writer.write({'distributed_computing_enabled': enabled })
 
-    async def set_frost_protection_enabled(self, enabled):
+    async def set_cleansing_temperature(self, value):
 
-        session = aiohttp_client.async_get_clientsession(self._hass, verify_ssl=False)
+        # Ensure values are within correct range
+        value = min(value, 55)
+        value = max(value, 51)
 
-        headers = {'Authorization': f'Bearer {self._token}'}
+        await self._settings_writer.write({'cleansing_temperature': value })
 
-        async with session.put(self._settings_url, headers=headers, json={'frost_protection_enabled': enabled }) as resp:
+    async def set_divert_exported_enabled(self, enabled):
 
-            if resp.status != 200:
-                _LOGGER.error("Call to %s to set frost protection enabled failed with status %i", self._settings_url, resp.status)
-                return
+        await self._settings_writer.write({'divert_exported_enabled': enabled })
 
-            await self.fetch_settings()
+    async def set_pv_cut_in_threshold(self, value):
 
-    async def set_distributed_computing_enabled(self, enabled):
+        # Ensure values are within correct range
+        value = min(value, 500)
+        value = max(value, 0)
 
-        session = aiohttp_client.async_get_clientsession(self._hass, verify_ssl=False)
+        await self._settings_writer.write({'pv_cut_in_threshold': value })
 
-        headers = {'Authorization': f'Bearer {self._token}'}
+    async def set_pv_charge_limit(self, value):
 
-        async with session.put(self._settings_url, headers=headers, json={'distributed_computing_enabled': enabled }) as resp:
+        # Ensure values are within correct range
+        value = min(value, 100)
+        value = max(value, 0)
 
-            if resp.status != 200:
-                _LOGGER.error("Call to %s to set distributed computing (medical research) enabled failed with status %i", self._settings_url, resp.status)
-                return
+        await self._settings_writer.write({'pv_charge_limit': value })
 
-            await self.fetch_settings()
+    async def set_pv_target_current(self, value):
 
-    async def set_cleansing_temperature(self, value):
+        # Ensure values are within correct range
+        value = min(value, 0)
+        value = max(value, -1)
+
+        await self._settings_writer.write({'pv_target_current': value })
+
+    async def set_pv_over_temperature(self, value):
 
         # Ensure values are within correct range
-        value = min(value, 55)
-        value = max(value, 51)
+        value = min(value, 60)
+        value = max(value, 45)
+
+        await self._settings_writer.write({'pv_over_temperature': value })
 
-        session = aiohttp_client.async_get_clientsession(self._hass, verify_ssl=False)
+    async def _queue_settings(self, payload):
 
-        headers = {'Authorization': f'Bearer {self._token}'}
+        # The coalescer has already merged this burst, so it isn't keyed and won't replace an earlier one.
+        await self._commands.submit(None, partial(self._put_settings, payload))
 
-        async with session.put(self._settings_url, headers=headers, json={'cleansing_temperature': value }) as resp:
+    async def _put_settings(self, payload):
+
+        async with self._request("PUT", self._settings_url, json=payload) as resp:
 
             if resp.status != 200:
-                _LOGGER.error("Call to %s to set cleansing temperature failed with status %i", self._settings_url, resp.status)
+                _LOGGER.error("Call to %s to update %s failed with status %i", self._settings_url, ", ".join(payload), resp.status)
                 return
 
-            await self.fetch_settings()
+        self._written()
+        self._state_written(TIER_SETTINGS)
 
-    async def set_divert_exported_enabled(self, enabled):
+        if self._optimistic_writes:
+            # Show the new values straight away. They're checked against the API on the next poll, and the
+            # cached response is dropped so that check can't be skipped as unchanged.
+            self._state = self._state.replace(settings=self._state.settings.with_api_fields(payload))
 
-        session = aiohttp_client.async_get_clientsession(self._hass, verify_ssl=False)
+            self._unconfirmed_settings.update(payload)
+            self._response_cache.invalidate(self._settings_url)
+            self.invalidate(TIER_SETTINGS)
 
-        headers = {'Authorization': f'Bearer {self._token}'}
+            await self.publish_updates()
+            return
 
-        async with session.put(self._settings_url, headers=headers, json={'divert_exported_enabled': enabled }) as resp:
+        # Settings only change through writes, so refresh them straight away rather than waiting for their tier.
+        self.invalidate(TIER_SETTINGS)
 
-            if resp.status != 200:
-                _LOGGER.error("Call to %s to set divert export enabled failed with status %i", self._settings_url, resp.status)
-                return
+        await self.fetch_settings()
 
-            await self.fetch_settings()
+        await self.publish_updates()
 
-    async def set_pv_cut_in_threshold(self, value):
+    @asynccontextmanager
+    async def _request(self, method, url, priority=None, **kwargs):
 
-        # Ensure values are within correct range
-        value = min(value, 500)
-        value = max(value, 0)
+        # Everything a write does, including the reads before and after it, is on the user's behalf, so none of
+        # it should wait behind (or be dropped like) a background poll.
+        if priority is None and running_command.get():
+            priority = PRIORITY_USER
 
-        session = aiohttp_client.async_get_clientsession(self._hass, verify_ssl=False)
+        async with self._account.request(method, url, priority=priority, **kwargs) as resp:
 
-        headers = {'Authorization': f'Bearer {self._token}'}
+            self._check_discovered_link(url, resp.status)
 
-        async with session.put(self._settings_url, headers=headers, json={'pv_cut_in_threshold': value }) as resp:
+            yield resp
 
-            if resp.status != 200:
-                _LOGGER.error("Call to %s to set PV cut in threshold failed with status %i", self._control_url, resp.status)
-                return
+    async def fetch_tank_information(self):
+
+        if self._latest_measurement_url:
+            _LOGGER.info("Tank information has already been fetched")
+            return
 
-            await self.fetch_settings()
+        tanks = await self._account.async_get_tank_list()
 
-    async def set_pv_charge_limit(self, value):
+        if tanks is None:
+            return False
 
-        # Ensure values are within correct range
-        value = min(value, 100)
-        value = max(value, 0)
+        tank = self._find_tank(tanks)
 
-        session = aiohttp_client.async_get_clientsession(self._hass, verify_ssl=False)
+        if not tank:
+            # The shared list may have been fetched before this tank was added to the account.
+            tanks = await self._account.async_get_tank_list(refresh=True)
 
-        headers = {'Authorization': f'Bearer {self._token}'}
+            if tanks is None:
+                return False
 
-        async with session.put(self._settings_url, headers=headers, json={'pv_charge_limit': value }) as resp:
+            tank = self._find_tank(tanks)
 
-            if resp.status != 200:
-                _LOGGER.error("Call to %s to set PV charge limit failed with status %i", self._control_url, resp.status)
-                return
+        if not tank:
+            _LOGGER.error("Could not find a tank with the serial number %s", self.serial_number)
+            return False
 
-            await self.fetch_settings()
+        tank_url = tank["_links"]["self"]["href"]
+        self.firmwareVersion = tank["firmwareVersion"]
 
-    async def set_pv_target_current(self, value):
+        async with self._request("GET", tank_url) as resp:
 
-        # Ensure values are within correct range
-        value = min(value, 0)
-        value = max(value, -1)
+            if resp.status != 200:
+                _LOGGER.error("Fetch of the tanks details at %s failed with status %i", tank_url, resp.status)
+                return False
 
-        session = aiohttp_client.async_get_clientsession(self._hass, verify_ssl=False)
+            tank_url_result = await resp.json()
 
-        headers = {'Authorization': f'Bearer {self._token}'}
+            _LOGGER.debug(tank_url_result)
 
-        async with session.put(self._settings_url, headers=headers, json={'pv_target_current': value }) as resp:
+            self._latest_measurement_url = tank_url_result["_links"]["latest_measurement"]["href"]
+            self._control_url = tank_url_result["_links"]["control"]["href"]
+            self._settings_url = tank_url_result["_links"]["settings"]["href"]
+            self._schedule_url = tank_url_result["_links"]["schedule"]["href"]
 
-            if resp.status != 200:
-                _LOGGER.error("Call to %s to set PV target current failed with status %i", self._control_url, resp.status)
-                return
+            self.modelCode = tank_url_result["tankModelCode"]
 
-            await self.fetch_settings()
+            tank_configuration_json = tank_url_result["configuration"]
+            tank_configuration = decoder.loads(tank_configuration_json)
+            
+            # Some tanks do not return a mixergyPvType - so force to NO_INVERTER
+            tank_configuration_pvtype = tank_configuration.get("mixergyPvType", "NO_INVERTER")
+            self._has_pv_diverter = (tank_configuration_pvtype != "NO_INVERTER")
 
-    async def set_pv_over_temperature(self, value):
+            _LOGGER.debug("Measurement URL is %s", self._latest_measurement_url)
+            _LOGGER.debug("Control URL is %s", self._control_url)
+            _LOGGER.debug("Settings URL is %s", self._settings_url)
+            _LOGGER.debug("Schedule URL is %s", self._schedule_url)
 
-        # Ensure values are within correct range
-        value = min(value, 60)
-        value = max(value, 45)
+            await self._async_save_discovery()
 
-        session = aiohttp_client.async_get_clientsession(self._hass, verify_ssl=False)
+            return True
 
-        headers = {'Authorization': f'Bearer {self._token}'}
+    def _find_tank(self, tanks):
 
-        async with session.put(self._settings_url, headers=headers, json={'pv_over_temperature': value }) as resp:
+        for tank in tanks:
+            if self.serial_number == tank['serialNumber']:
+                _LOGGER.info("Found a tank with matching serial number %s!", self.serial_number)
+                return tank
 
-            if resp.status != 200:
-                _LOGGER.error("Call to %s to set PV over temperature failed with status %i", self._control_url, resp.status)
-                return
+        return None
 
-            await self.fetch_settings()
+    async def async_load_discovery(self):
+        """Restores the links found by a previous discovery, so startup can go straight to the measurement."""
 
-    async def authenticate(self):
+        await self._account.async_load_discovery()
 
-        if self._token:
-            _LOGGER.info("Authentication token is valid")
+        data = self._account.tank_discovery(self.serial_number)
+
+        if not data:
             return
 
-        session = aiohttp_client.async_get_clientsession(self._hass, verify_ssl=False)
+        try:
+            self._latest_measurement_url = data["latest_measurement_url"]
+            self._control_url = data["control_url"]
+            self._settings_url = data["settings_url"]
+            self._schedule_url = data["schedule_url"]
+            self.modelCode = data["model_code"]
+            self.firmwareVersion = data["firmware_version"]
+            self._has_pv_diverter = data["has_pv_diverter"]
+        except KeyError:
+            _LOGGER.info("Ignoring incomplete discovery cache for tank %s", self.serial_number)
+            self._forget_discovery()
+            return
 
-        async with session.get(ROOT_ENDPOINT) as resp:
+        _LOGGER.debug("Loaded discovery cache for tank %s", self.serial_number)
 
-            if resp.status != 200:
-                _LOGGER.error("Fetch of root at %s failed with status code %i", ROOT_ENDPOINT, resp.status)
-                return False
+    async def async_restore_state(self):
+        """Restores the state saved before Home Assistant last stopped. Returns whether there was one."""
 
-            root_result = await resp.json()
+        data = await self._state_store.async_load()
 
-            self._account_url = root_result["_links"]["account"]["href"]
+        if not data:
+            return False
 
-            _LOGGER.info("Account URL: %s", self._account_url)
+        try:
+            self._state = TankState.from_dict(data)
+            self._last_success = {endpoint: dt_util.parse_datetime(fetched_at) for endpoint, fetched_at in data.get("last_success", {}).items()}
+        except (KeyError, TypeError, ValueError):
+            _LOGGER.info("Ignoring unreadable saved state for tank %s", self.serial_number)
+            return False
 
-            async with session.get(self._account_url) as resp:
+        self._stale = True
 
-                if resp.status != 200:
-                    _LOGGER.error("Fetch of account at %s failed with status code %i", self._account_url, resp.status)
-                    return False
+        _LOGGER.debug("Restored the last known state of tank %s", self.serial_number)
 
-                account_result = await resp.json()
+        return True
 
-                self._login_url = account_result["_links"]["login"]["href"]
+    def _save_state(self):
 
-                _LOGGER.info("Login URL: %s", self._login_url)
+        # Saving is delayed, so a run of refreshes only writes the file once. Scheduling it again would restart
+        # the delay, and polls come round faster than that, so it'd never be written.
+        if self._save_pending:
+            return
 
-        async with session.post(self._login_url, json={'username': self.username, 'password': self.password}) as resp:
+        self._save_pending = True
+        self._state_store.async_delay_save(self._state_data, STATE_SAVE_DELAY.total_seconds())
 
-            if resp.status != 201:
-                _LOGGER.error("Authentication failed with status code %i", resp.status)
-                return False
+    def _state_data(self):
 
-            login_result = await resp.json()
-            token = login_result['token']
-            self._token = token
-            return True
+        self._save_pending = False
 
-    async def fetch_tank_information(self):
+        data = self._state.as_dict()
+        data["last_success"] = {endpoint: fetched_at.isoformat() for endpoint, fetched_at in self._last_success.items()}
 
-        if self._latest_measurement_url:
-            _LOGGER.info("Tank information has already been fetched")
+        return data
+
+    async def _async_save_discovery(self):
+
+        await self._account.async_save_tank_discovery(self.serial_number, {
+            "latest_measurement_url": self._latest_measurement_url,
+            "control_url": self._control_url,
+            "settings_url": self._settings_url,
+            "schedule_url": self._schedule_url,
+            "model_code": self.modelCode,
+            "firmware_version": self.firmwareVersion,
+            "has_pv_diverter": self._has_pv_diverter,
+        })
+
+    def _forget_discovery(self):
+        # Clearing the measurement URL makes fetch_tank_information walk the links again on the next refresh.
+        self._latest_measurement_url = ""
+        self._account.forget_tank_discovery(self.serial_number)
+
+    def _check_discovered_link(self, url, status):
+
+        if status != 404:
             return
 
-        session = aiohttp_client.async_get_clientsession(self._hass, verify_ssl=False)
+        if url in (self._latest_measurement_url, self._control_url, self._settings_url, self._schedule_url):
+            _LOGGER.warning("%s returned 404, the tank's links will be discovered again", url)
+            self._forget_discovery()
 
-        headers = {'Authorization': f'Bearer {self._token}'}
+    async def fetch_last_measurement(self):
+        return await self._single_flight.run(ENDPOINT_MEASUREMENT, self._fetch_last_measurement)
 
-        async with session.get(ROOT_ENDPOINT, headers=headers) as resp:
+    async def _fetch_last_measurement(self):
 
-            if resp.status != 200:
-                _LOGGER.error("Fetch of root at %s failed with status code %i", ROOT_ENDPOINT, resp.status)
-                return False
+        # The tank reports less often than we poll, so most polls return the measurement we already have.
+        # Those are spotted by their hash (in _fetch_if_modified) or their timestamp, and skipped.
+        fetched, tank_result = await self._fetch_if_modified(self._latest_measurement_url, ENDPOINT_MEASUREMENT)
 
-            root_result = await resp.json()
+        if not fetched:
+            return
 
-            self._tanks_url = root_result["_links"]["tanks"]["href"]
+        if tank_result is SUPERSEDED:
+            return False
 
-        async with session.get(self._tanks_url, headers=headers) as resp:
+        reported_at = _measurement_timestamp(tank_result) if tank_result is not None else None
 
-            if resp.status != 200:
-                _LOGGER.error("Fetch of tanks at %s failed with status code %i", self._tanks_url, resp.status)
-                return False
+        if tank_result is None or (reported_at is not None and reported_at == self._measurement_reported_at):
+            self._measurement_repeated()
 
-            tank_result = await resp.json()
+            # Nothing new, but a written target charge may have gone unconfirmed for too long.
+            return self._expire_unconfirmed_charge()
 
-            tanks = tank_result['_embedded']['tankList']
+        self._measurement_reported(reported_at)
 
-            _LOGGER.debug(tanks)
+        measurement = Measurement.from_json(tank_result, self._state.measurement)
 
-            tank = None
+        if self._unconfirmed_charge is not None:
+            measurement = self._reconcile_charge(measurement, reported_at)
 
-            for i, subjobj in enumerate(tanks):
-                if self.serial_number == subjobj['serialNumber']:
-                    _LOGGER.info("Found a tank with matching serial number %s!", self.serial_number)
-                    tank = subjobj
-                    break
+        previous_charge = self._state.measurement.charge
+        new_charge = measurement.charge
 
-            if not tank:
-                _LOGGER.error("Could not find a tank with the serial number %s", self.serial_number)
-                return False
+        _LOGGER.debug("Current: %f", previous_charge)
+        _LOGGER.debug("New: %f", new_charge)
 
-            tank_url = tank["_links"]["self"]["href"]
-            self.firmwareVersion = tank["firmwareVersion"]
+        if new_charge != previous_charge and self._charge_event_deadband.check(new_charge):
+            _LOGGER.debug('Sending charge_changed event')
 
-            async with session.get(tank_url, headers=headers) as resp:
+            event_data = {
+                "device_id": self._id,
+                "type": "charge_changed",
+                "charge" : new_charge
+            }
 
-                if resp.status != 200:
-                    _LOGGER.error("Fetch of the tanks details at %s failed with status %i", tank_url, resp.status)
-                    return False
+            self._hass.bus.async_fire("mixergy_event", event_data)
 
-                tank_url_result = await resp.json()
+        if new_charge == previous_charge:
+            self._unchanged_charge_polls += 1
+        else:
+            self._unchanged_charge_polls = 0
 
-                _LOGGER.debug(tank_url_result)
+        self._state = self._state.replace(measurement=measurement)
 
-                self._latest_measurement_url = tank_url_result["_links"]["latest_measurement"]["href"]
-                self._control_url = tank_url_result["_links"]["control"]["href"]
-                self._settings_url = tank_url_result["_links"]["settings"]["href"]
-                self._schedule_url = tank_url_result["_links"]["schedule"]["href"]
+        return True
 
-                self.modelCode = tank_url_result["tankModelCode"]
+    def _reconcile_charge(self, measurement, reported_at):
+        """Returns the measurement to show while a written target charge hasn't been confirmed."""
 
-                tank_configuration_json = tank_url_result["configuration"]
-                tank_configuration = json.loads(tank_configuration_json)
-                
-                # Some tanks do not return a mixergyPvType - so force to NO_INVERTER
-                tank_configuration_pvtype = tank_configuration.get("mixergyPvType", "NO_INVERTER")
-                self._has_pv_diverter = (tank_configuration_pvtype != "NO_INVERTER")
+        written, written_at = self._unconfirmed_charge
 
-                _LOGGER.debug("Measurement URL is %s", self._latest_measurement_url)
-                _LOGGER.debug("Control URL is %s", self._control_url)
-                _LOGGER.debug("Settings URL is %s", self._settings_url)
-                _LOGGER.debug("Schedule URL is %s", self._schedule_url)
+        # A measurement taken before the write can't reflect it, so keep showing what was written. Without a
+        # timestamp, the best we can tell is whether it's the same measurement we had at the time.
+        if reported_at is not None:
+            before_write = reported_at / 1000 < written_at
+        else:
+            before_write = measurement == self._reported_measurement
 
-                return True
+        if before_write:
+            self._reported_measurement = measurement
 
-    async def fetch_last_measurement(self):
+            if self._expire_unconfirmed_charge():
+                return measurement
 
-        session = aiohttp_client.async_get_clientsession(self._hass, verify_ssl=False)
+            return measurement.with_target_charge(written)
 
-        headers = {'Authorization': f'Bearer {self._token}'}
+        self._unconfirmed_charge = None
+        self._reported_measurement = None
 
-        async with session.get(self._latest_measurement_url, headers=headers) as resp:
+        reported = measurement.target_charge
 
-            if resp.status != 200:
-                _LOGGER.info("Fetch of the latest measurement at %s failed with status %i", self._latest_measurement_url, resp.status)
-                return
+        # The API clears the target once the tank has reached it, so that isn't a disagreement.
+        if reported != written and not (reported == 0 and measurement.charge >= written):
+            _LOGGER.warning("Tank %s reports a target charge of %s rather than the %s that was written, using the reported value", self.serial_number, reported, written)
 
-            tank_result = await resp.json()
-            _LOGGER.debug(tank_result)
+        return measurement
 
-            self._hot_water_temperature = tank_result["topTemperature"]
-            self._coldest_water_temperature = tank_result["bottomTemperature"]
+    def _expire_unconfirmed_charge(self):
+        """Goes back to the reported target charge once a written one has gone unconfirmed for too long. Returns
+        whether it did."""
 
-            if "pvEnergy" in tank_result:
-                self._pv_power = tank_result["pvEnergy"] / 60000
-            else:
-                self._pv_power = 0
+        if self._unconfirmed_charge is None:
+            return False
 
-            if "clampPower" in tank_result:
-                self._clamp_power = tank_result["clampPower"]
-            else:
-                self._clamp_power = 0
+        written, written_at = self._unconfirmed_charge
 
-            new_charge = tank_result["charge"]
+        if time.time() - written_at < CHARGE_CONFIRM_TIMEOUT.total_seconds():
+            return False
 
-            _LOGGER.debug("Current: %f", self._charge)
-            _LOGGER.debug("New: %f", new_charge)
+        _LOGGER.warning("Tank %s hasn't reported a measurement since its target charge was set to %s, using the last reported target of %s", self.serial_number, written, self._reported_measurement.target_charge)
 
-            if new_charge != self._charge:
-                _LOGGER.debug('Sending charge_changed event')
+        self._state = self._state.replace(measurement=self._reported_measurement)
+        self._unconfirmed_charge = None
+        self._reported_measurement = None
 
-                event_data = {
-                    "device_id": self._id,
-                    "type": "charge_changed",
-                    "charge" : new_charge
-                }
+        return True
 
-                self._hass.bus.async_fire("mixergy_event", event_data)
+    def _measurement_repeated(self):
 
-            self._charge = new_charge
+        self.repeated_measurements += 1
+        self._polls_since_measurement += 1
 
-            # Fetch information about the current state of the heating.
+        # The charge can't have moved if there's no new measurement.
+        self._unchanged_charge_polls += 1
 
-            state = json.loads(tank_result["state"])
+    def _measurement_reported(self, reported_at):
 
-            current = state["current"]
+        if reported_at is not None:
+            self._cadence.observe(reported_at / 1000)
+        else:
+            # Without a timestamp from the tank, use when we saw it. That's only a fair measure of the gap if
+            # we'd polled in between and seen nothing new, otherwise the gap is just our poll interval.
+            self._cadence.observe(time.monotonic(), sample=self._polls_since_measurement > 0)
 
-            new_target_charge = 0
+        self._measurement_reported_at = reported_at
+        self._polls_since_measurement = 0
 
-            if "target" in current:
-                new_target_charge = current["target"]
-            else:
-                new_target_charge = 0
+    async def _fetch_if_modified(self, url, endpoint):
+        """Fetches a JSON document, returning (fetched, json_object). json_object is None if it is unchanged, and
+        SUPERSEDED if our state has been written since the request was made."""
 
-            self._target_charge = new_target_charge
+        sequence = next(self._sequence)
 
-            vacation = False
+        headers = self._response_cache.conditional_headers(url)
 
-            # Source is only present when vacation is enabled it seems
-            if "source" in current:
-                source = current["source"]
-                vacation = source == "Vacation"
+        async with self._request("GET", url, headers=headers) as resp:
 
-            if vacation:
-                self._in_holiday_mode = True
+            if resp.status == 304:
+                _LOGGER.debug("The %s at %s has not been modified", endpoint, url)
+                return True, None
 
-                # Assume it's all off as the tank is in holiday mode
-                self._electric_heat_source = False
-                self._heatpump_heat_source = False
-                self._indirect_heat_source = False
+            if resp.status != 200:
+                _LOGGER.warning("Fetch of the %s %s failed with status %i", endpoint, url, resp.status)
+                return False, None
 
-            else:
-                self._in_holiday_mode = False
+            # The settings and schedule APIs return text/plain as the content-type, so using the resp.json() fails.
+            # Read the raw body so it can be compared with the last one before we bother decoding it.
+            body = await resp.read()
+
+            if not self._response_cache.store(url, resp.headers, body):
+                return True, None
+
+        json_object = decoder.loads(body)
+        _LOGGER.debug(json_object)
+
+        if not self._accept_response(endpoint, sequence):
+            # Forget this body, otherwise the next fetch would skip it as unchanged.
+            self._response_cache.invalidate(url)
+            return True, SUPERSEDED
+
+        return True, json_object
+
+    def _accept_response(self, endpoint, sequence):
+        """Returns False if the state for this endpoint has changed since the request was made."""
+
+        if sequence < self._applied_sequence.get(endpoint, 0):
+            _LOGGER.debug("Discarding out of date %s response", endpoint)
+            return False
 
-                heat_source = current["heat_source"].lower()
-                heat_source_on = current["immersion"].lower() == "on"
+        self._applied_sequence[endpoint] = sequence
 
-                if heat_source == "indirect":
-                    self._electric_heat_source = False
-                    self._heatpump_heat_source = False
-                    self._indirect_heat_source = heat_source_on
+        return True
 
-                elif heat_source == "electric":
-                    self._electric_heat_source = heat_source_on
-                    self._indirect_heat_source = False
-                    self._heatpump_heat_source = False
+    def _state_written(self, endpoint):
+        """Marks our state for this endpoint as newer than any response that's still on its way."""
 
-                elif heat_source == "heatpump":
-                    self._heatpump_heat_source = heat_source_on
-                    self._indirect_heat_source = False
-                    self._electric_heat_source = False
+        self._applied_sequence[endpoint] = next(self._sequence)
 
-                else:
-                    self._indirect_heat_source = False
-                    self._electric_heat_source = False
-                    self._heatpump_heat_source = False
+        # A fetch that's already running started before the write, so don't let anyone join it.
+        self._single_flight.forget(endpoint)
 
     async def fetch_settings(self):
+        return await self._single_flight.run(TIER_SETTINGS, self._fetch_settings)
 
-        session = aiohttp_client.async_get_clientsession(self._hass, verify_ssl=False)
+    async def _fetch_settings(self):
 
-        headers = {'Authorization': f'Bearer {self._token}'}
+        fetched, json_object = await self._fetch_if_modified(self._settings_url, TIER_SETTINGS)
 
-        async with session.get(self._settings_url, headers=headers) as resp:
+        if not fetched:
+            return
 
-            if resp.status != 200:
-                _LOGGER.info("Fetch of the settings %s failed with status %i", self._settings_url, resp.status)
-                return
+        # Don't count it as a refresh, so the written settings are still checked on the next poll.
+        if json_object is SUPERSEDED:
+            return False
+
+        self._mark_refreshed(TIER_SETTINGS)
 
-            # The settings API returns text/plain as the content-type, so using the resp.json() fails.
-            # Load it as a bit of JSON via the text.
-            response_text = await resp.text()
-            json_object = json.loads(response_text)
-            _LOGGER.debug(json_object)
-
-            self._target_temperature = json_object["max_temp"]
-            self._dsr_enabled = json_object["dsr_enabled"]
-            self._frost_protection_enabled = json_object["frost_protection_enabled"]
-            self._distributed_computing_enabled = json_object["distributed_computing_enabled"]
-            self._cleansing_temperature = json_object["cleansing_temperature"]
-
-            try:
-                self._divert_exported_enabled = json_object["divert_exported_enabled"]
-                self._pv_charge_limit = json_object["pv_charge_limit"]
-                self._pv_cut_in_threshold = json_object["pv_cut_in_threshold"]
-                self._pv_target_current = json_object["pv_target_current"]
-                self._pv_over_temperature = json_object["pv_over_temperature"]
-            except KeyError:
-                pass
+        if json_object is None:
+            return False
+
+        self._state = self._state.replace(settings=Settings.from_json(json_object, self._state.settings))
+
+        self._confirm_settings(json_object)
+
+        return True
+
+    def _confirm_settings(self, json_object):
+
+        for field, written in self._unconfirmed_settings.items():
+            reported = json_object.get(field)
+
+            if reported != written:
+                _LOGGER.warning("Tank %s reports %s as %s rather than the %s that was written, using the reported value", self.serial_number, field, reported, written)
+
+        self._unconfirmed_settings = {}
 
     async def fetch_schedule(self):
+        return await self._single_flight.run(TIER_SCHEDULE, self._fetch_schedule)
 
-        session = aiohttp_client.async_get_clientsession(self._hass, verify_ssl=False)
+    async def _fetch_schedule(self):
 
-        headers = {'Authorization': f'Bearer {self._token}'}
+        fetched, json_object = await self._fetch_if_modified(self._schedule_url, TIER_SCHEDULE)
 
-        async with session.get(self._schedule_url, headers=headers) as resp:
+        if not fetched:
+            return
 
-            if resp.status != 200:
-                _LOGGER.info("Fetch of the schedule %s failed with status %i", self._schedule_url, resp.status)
-                return
+        if json_object is SUPERSEDED:
+            return False
+
+        self._mark_refreshed(TIER_SCHEDULE)
 
-            # The schedule API returns text/plain as the content-type, so using the resp.json() fails.
-            # Load it as a bit of JSON via the text.
-            response_text = await resp.text()
-            json_object = json.loads(response_text)
-            _LOGGER.debug(json_object)
+        if json_object is None:
+            return False
 
-            self._schedule = json_object
+        self._state = self._state.replace(schedule=Schedule.from_json(json_object))
 
-    async def set_schedule(self, value):
+        self._confirm_schedule(json_object)
 
-        session = aiohttp_client.async_get_clientsession(self._hass, verify_ssl=False)
+        return True
+
+    def _confirm_schedule(self, json_object):
+
+        if self._unconfirmed_schedule is None:
+            return
+
+        written = self._unconfirmed_schedule
+        self._unconfirmed_schedule = None
 
-        headers = {'Authorization': f'Bearer {self._token}'}
+        differences = [key for key in written.keys() | json_object.keys() if written.get(key) != json_object.get(key)]
 
-        async with session.put(self._schedule_url, headers=headers, json=value) as resp:
+        if differences:
+            _LOGGER.warning("Tank %s reports a different schedule to the one that was written (%s), using the reported schedule", self.serial_number, ", ".join(sorted(differences)))
+
+    async def _put_schedule(self, value, if_match=None):
+        """Writes the schedule, returning the response's status."""
+
+        # With the ETag of the schedule the changes were made to, the API can refuse the write (with a 412) if
+        # it's been changed since.
+        headers = {"If-Match": if_match} if if_match else None
+
+        async with self._request("PUT", self._schedule_url, json=value, headers=headers) as resp:
 
             if resp.status != 200:
-                _LOGGER.error("Call to %s to set schedule failed with status %i", self._schedule_url, resp.status)
-                return
+                if resp.status != 412:
+                    _LOGGER.error("Call to %s to set schedule failed with status %i", self._schedule_url, resp.status)
 
-            await self.fetch_schedule()
+                return resp.status
 
-    async def set_holiday_dates(self, start_date: datetime, end_date: datetime):
+        self._written()
+        self._state_written(TIER_SCHEDULE)
+
+        self.invalidate(TIER_SCHEDULE)
+
+        # Whenever the schedule is next read, it's compared with what was written, to catch anything else
+        # changing it at the same time.
+        self._unconfirmed_schedule = value
+
+        if self._optimistic_writes:
+            # As with the settings, use the written schedule now and check it on the next poll.
+            self._state = self._state.replace(schedule=Schedule.from_json(value))
+            self._response_cache.invalidate(self._schedule_url)
+            return resp.status
 
         await self.fetch_schedule()
 
-        schedule = self._schedule
+        return resp.status
 
-        if schedule == None:
-            _LOGGER.error("Tried to set holiday dates but no schedule to set")
-            return
+    def schedule_transaction(self) -> ScheduleTransaction:
+        """Starts a batch of changes to the schedule, which are written together when it's committed."""
+        return ScheduleTransaction(self)
 
-        schedule["holiday"] = {
-            "departDate": int(start_date.timestamp()) * 1000,
-            "returnDate": int(end_date.timestamp()) * 1000
-        }
+    async def commit_schedule(self, transaction: ScheduleTransaction):
 
-        await self.set_schedule(schedule)
+        # Transactions run in the command queue, so they can't interleave with each other or with other writes.
+        # Any committed while one is waiting to run are merged into it, so a burst of changes (e.g. holiday dates
+        # and the default heat source) is written with one GET and one PUT.
+        if self._pending_schedule is None:
+            self._pending_schedule = ScheduleTransaction(self)
 
-        await self.publish_updates()
+        self._pending_schedule.merge(transaction)
 
-    async def clear_holiday_dates(self):
+        await self._commands.submit("schedule", self._commit_pending_schedule)
 
-        await self.fetch_schedule()
+    async def _commit_pending_schedule(self):
 
-        schedule = self._schedule
+        transaction, self._pending_schedule = self._pending_schedule, None
 
-        if schedule == None:
-            _LOGGER.error("Tried to clear holiday dates but no schedule to set")
-            return
+        await self._commit_schedule(transaction)
 
-        # Remove the holiday settings from the payload and send it back.
-        schedule.pop("holiday", None)
+    async def _commit_schedule(self, transaction: ScheduleTransaction):
 
-        await self.set_schedule(schedule)
+        # With an ETag, the API refuses (with a 412) a write to a schedule that's been changed since we read it,
+        # so the cached schedule can be used while it's fresh. These endpoints don't normally send one though,
+        # so otherwise it's read again just before writing. The request is conditional, and the body's hash
+        # shows whether anyone else has changed it.
+        if self._state.schedule.raw is None or self._tier_due(TIER_SCHEDULE) or self._response_cache.etag(self._schedule_url) is None:
 
-        await self.publish_updates()
+            # Don't join a poll's fetch, which may be waiting behind other polls, make a request of our own.
+            self._single_flight.forget(TIER_SCHEDULE)
 
-    async def set_default_heat_source(self, heat_source):
+            if await self.fetch_schedule() is None:
+                _LOGGER.error("Tried to change the schedule of tank %s, but failed to fetch it", self.serial_number)
+                return
 
-        await self.fetch_schedule()
+        for attempt in range(SCHEDULE_CONFLICT_RETRIES + 1):
 
-        schedule = self._schedule
+            current = self._state.schedule.raw
 
-        if schedule == None:
-            _LOGGER.error("Tried to set the default heat source, but failed to fetch the schedule")
-            return
+            if current is None:
+                _LOGGER.error("Tried to change the schedule of tank %s, but failed to fetch it", self.serial_number)
+                return
 
-        schedule["defaultHeatSource"] = heat_source
+            schedule = transaction.apply(current)
 
-        await self.set_schedule(schedule)
+            if schedule == current:
+                _LOGGER.debug("The schedule of tank %s already has these changes", self.serial_number)
+                return
 
-        await self.publish_updates()
+            status = await self._put_schedule(schedule, self._response_cache.etag(self._schedule_url))
+
+            if status != 412:
+                await self.publish_updates()
+                return
+
+            # Someone else has changed the schedule since we fetched it. Apply the changes to theirs instead.
+            _LOGGER.warning("The schedule of tank %s was changed while it was being updated, retrying with the latest", self.serial_number)
+
+            self._response_cache.invalidate(self._schedule_url)
+            self.invalidate(TIER_SCHEDULE)
+
+            if await self.fetch_schedule() is None:
+                _LOGGER.error("Failed to fetch the latest schedule of tank %s, so it hasn't been changed", self.serial_number)
+                return
+
+        _LOGGER.error("Gave up changing the schedule of tank %s, as it kept being changed at the same time", self.serial_number)
+
+    async def set_holiday_dates(self, start_date: datetime, end_date: datetime):
+        await self.schedule_transaction().set_holiday_dates(start_date, end_date).commit()
+
+    async def clear_holiday_dates(self):
+        await self.schedule_transaction().clear_holiday_dates().commit()
+
+    async def set_default_heat_source(self, heat_source):
+        await self.schedule_transaction().set_default_heat_source(heat_source).commit()
 
     async def fetch_data(self):
 
         _LOGGER.info('Fetching data....')
 
-        await self.authenticate()
+        try:
+            await self._account.authenticate()
+
+            await self.fetch_tank_information()
+        except Exception as err:  # pylint: disable=broad-except
+            # Without a login there's no measurement, so count it as a failed fetch.
+            self._record_failure(ENDPOINT_MEASUREMENT)
+            self._hasFetched = True
+            await self.publish_updates()
+            raise UpdateFailed(f"Failed to log in to fetch tank {self.serial_number}: {err}") from err
+
+        # The measurement, settings and schedule endpoints are independent of each other, so fetch them
+        # concurrently. A failure in one shouldn't stop the others from updating.
+        fetches = {
+            ENDPOINT_MEASUREMENT: self.fetch_last_measurement(),
+        }
+
+        if self._tier_due(TIER_SETTINGS):
+            fetches[TIER_SETTINGS] = self.fetch_settings()
 
-        await self.fetch_tank_information()
+        if self._tier_due(TIER_SCHEDULE):
+            fetches[TIER_SCHEDULE] = self.fetch_schedule()
 
-        await self.fetch_last_measurement()
+        results = await asyncio.gather(*fetches.values(), return_exceptions=True)
 
-        await self.fetch_settings()
+        changed = False
+        succeeded = False
+        failed = []
 
-        await self.fetch_schedule()
+        for endpoint, result in zip(fetches.keys(), results):
+            if isinstance(result, Exception):
+                _LOGGER.error("Fetch of the %s failed: %s", endpoint, result)
+                failed.append(endpoint)
+            elif result is None:
+                failed.append(endpoint)
+            else:
+                self._record_success(endpoint)
+                succeeded = True
+                changed = changed or result
+
+        for endpoint in failed:
+            self._record_failure(endpoint)
+
+        # A restored state is fresh again once the measurement has been fetched. The settings and schedule are
+        # on slow tiers, so waiting for them too could leave it marked stale for a long time.
+        if self._stale and ENDPOINT_MEASUREMENT not in failed:
+            _LOGGER.debug("Tank %s has been fetched, its restored state is no longer stale", self.serial_number)
+            self._stale = False
+            changed = True
+
+        # The fetch times are saved too, so they have to be whenever one has moved, even if nothing else has.
+        # Otherwise the restored times could be much older than the last fetch that worked.
+        if changed or succeeded:
+            self._save_state()
 
+        self._hasFetched = True
+
+        # Publish even if nothing changed, as the fetch times (and maybe availability) have. Only the entities
+        # that read them are written.
         await self.publish_updates()
 
-    def register_callback(self, callback):
-        self._callbacks.add(callback)
+        # The settings and schedule are refreshed on slow tiers and only change through writes, so only a
+        # failed measurement fails the refresh.
+        if ENDPOINT_MEASUREMENT in failed:
+            raise UpdateFailed(f"Failed to fetch the latest measurement for tank {self.serial_number}")
+
+    def _record_success(self, endpoint):
+        self._last_success[endpoint] = dt_util.utcnow()
+        self._consecutive_failures[endpoint] = 0
+
+    def _record_failure(self, endpoint):
+
+        failures = self._consecutive_failures.get(endpoint, 0) + 1
+        self._consecutive_failures[endpoint] = failures
+
+        _LOGGER.debug("Fetch of the %s for tank %s has failed %i time(s) in a row", endpoint, self.serial_number, failures)
+
+    def register_callback(self, callback, inputs=()):
+        """Registers a callback to run when any of the inputs (fields of the snapshot) change.
+
+        A callback with no inputs runs on every publish. Every callback runs when the tank's availability, or
+        whether its state is stale, changes.
+        """
+        self._callbacks[callback] = frozenset(inputs) | {"online", "stale"} if inputs else frozenset()
 
     def remove_callback(self, callback):
-        self._callbacks.discard(callback)
+        self._callbacks.pop(callback, None)
+
+    def snapshot(self):
+        return MappingProxyType({field: getattr(self, field) for field in SNAPSHOT_FIELDS})
 
     async def publish_updates(self):
-        for callback in self._callbacks:
-            callback()
+
+        snapshot = self.snapshot()
+
+        previous, self._published = self._published, snapshot
+
+        # Fields with a deadband are compared with the last value written, rather than the last snapshot, so
+        # they can't creep away from it in small steps.
+        now = time.monotonic()
+        deadbanded = {field for field, deadband in self._deadbands.items() if deadband.check(snapshot[field], now)}
+
+        if previous is None:
+            changed = None
+        else:
+            changed = {field for field in SNAPSHOT_FIELDS if field not in self._deadbands and snapshot[field] != previous[field]}
+            changed |= deadbanded
+
+            if not changed:
+                return
+
+            _LOGGER.debug("Changed: %s", ", ".join(sorted(changed)))
+
+        for callback, inputs in list(self._callbacks.items()):
+            if changed is None or not inputs or not changed.isdisjoint(inputs):
+                callback()
 
     @property
     def online(self):
-        return True
+
+        # A restored tank shows its last state (marked as stale) until its first fetch has finished, however old
+        # that state is.
+        if self._stale and not self._hasFetched:
+            return True
+
+        fetched_at = self._last_success.get(ENDPOINT_MEASUREMENT)
+
+        return fetched_at is not None and dt_util.utcnow() - fetched_at < self._stale_after
+
+    @property
+    def measurement_fetched_at(self) -> Optional[datetime]:
+        return self._last_success.get(ENDPOINT_MEASUREMENT)
+
+    @property
+    def settings_fetched_at(self) -> Optional[datetime]:
+        return self._last_success.get(TIER_SETTINGS)
+
+    @property
+    def schedule_fetched_at(self) -> Optional[datetime]:
+        return self._last_success.get(TIER_SCHEDULE)
+
+    @property
+    def consecutive_failures(self):
+        return max(self._consecutive_failures.values(), default=0)
+
+    @property
+    def measurement_failures(self):
+        return self._consecutive_failures.get(ENDPOINT_MEASUREMENT, 0)
+
+    def endpoint_health(self):
+        """Returns when each endpoint was last fetched, and how many times in a row it's failed since."""
+        return {
+            endpoint: {
+                "last_success": self._last_success.get(endpoint),
+                "consecutive_failures": self._consecutive_failures.get(endpoint, 0),
+            }
+            for endpoint in ENDPOINTS
+        }
+
+    @property
+    def stale(self):
+        return self._stale
+
+    @property
+    def command_queue_depth(self):
+        return self._commands.depth
+
+    @property
+    def command_latency(self):
+        return self._commands.average_latency
+
+    @property
+    def connections_created(self):
+        return self._account.connections_created
+
+    @property
+    def connections_reused(self):
+        return self._account.connections_reused
+
+    @property
+    def state(self) -> TankState:
+        return self._state
+
+    @property
+    def state_memory_size(self):
+        return self._state.memory_size()
+
+    @property
+    def is_heating(self):
+        measurement = self._state.measurement
+        return measurement.electric_heat_source or measurement.heatpump_heat_source or measurement.indirect_heat_source or measurement.target_charge > 0
+
+    @property
+    def seconds_since_write(self):
+        if self._last_write_at is None:
+            return float("inf")
+
+        return time.monotonic() - self._last_write_at
+
+    @property
+    def reporting_interval(self):
+        """How often, in seconds, the tank reports a new measurement, or None until that's been learned."""
+        return self._cadence.interval
+
+    @property
+    def charge_is_flat(self):
+        return self._unchanged_charge_polls >= FLAT_CHARGE_POLLS
 
     @property
     def hot_water_temperature(self):
-        return self._hot_water_temperature
+        return self._state.measurement.hot_water_temperature
 
     @property
     def coldest_water_temperature(self):
-        return self._coldest_water_temperature
+        return self._state.measurement.coldest_water_temperature
 
     @property
     def charge(self):
-        return self._charge
+        return self._state.measurement.charge
+
+    # The thresholds are read from the charge as reported, and have their own snapshot fields, so the charge's
+    # deadband can't hold back a sensor crossing one.
+
+    @property
+    def low_charge(self):
+        return self._state.measurement.charge < 5
+
+    @property
+    def no_charge(self):
+        return self._state.measurement.charge < 0.5
 
     @property
     def target_charge(self):
-        return self._target_charge
+        return self._state.measurement.target_charge
 
     @property
     def indirect_heat_source(self):
-        return self._indirect_heat_source
+        return self._state.measurement.indirect_heat_source
 
     @property
     def electic_heat_source(self):
-        return self._electric_heat_source
+        return self._state.measurement.electric_heat_source
 
     @property
     def in_holiday_mode(self):
-        return self._in_holiday_mode
+        return self._state.measurement.in_holiday_mode
 
     @property
     def heatpump_heat_source(self):
-        return self._heatpump_heat_source
+        return self._state.measurement.heatpump_heat_source
 
     @property
     def target_temperature(self):
-        return self._target_temperature
+        return self._state.settings.target_temperature
 
     @property
     def dsr_enabled(self):
-        return self._dsr_enabled
+        return self._state.settings.dsr_enabled
 
     @property
     def frost_protection_enabled(self):
-        return self._frost_protection_enabled
+        return self._state.settings.frost_protection_enabled
 
     @property
     def distributed_computing_enabled(self):
-        return self._distributed_computing_enabled
+        return self._state.settings.distributed_computing_enabled
 
     @property
     def cleansing_temperature(self):
-        return self._cleansing_temperature
+        return self._state.settings.cleansing_temperature
 
     @property
     def pv_power(self):
-        return self._pv_power
+        return self._state.measurement.pv_power
 
     @property
     def clamp_power(self):
-        return self._clamp_power
+        return self._state.measurement.clamp_power
 
     @property
     def has_pv_diverter(self):
@@ -676,47 +1164,32 @@ class Tank:
 
     @property
     def divert_exported_enabled(self):
-        return self._divert_exported_enabled
+        return self._state.settings.divert_exported_enabled
 
     @property
     def pv_cut_in_threshold(self):
-        return self._pv_cut_in_threshold
+        return self._state.settings.pv_cut_in_threshold
 
     @property
     def pv_charge_limit(self):
-        return self._pv_charge_limit
+        return self._state.settings.pv_charge_limit
 
     @property
     def pv_target_current(self):
-        return self._pv_target_current
+        return self._state.settings.pv_target_current
 
     @property
     def pv_over_temperature(self):
-        return self._pv_over_temperature
+        return self._state.settings.pv_over_temperature
 
     @property
     def holiday_date_start(self) -> Optional[datetime]:
-        try:
-            return datetime.fromtimestamp(self._schedule["holiday"]["departDate"] / 1000)
-        except KeyError:
-            return None
-        except TypeError:
-            return None
+        return self._state.schedule.holiday_date_start
 
     @property
     def holiday_date_end(self) -> Optional[datetime]:
-        try:
-            return datetime.fromtimestamp(self._schedule["holiday"]["returnDate"] / 1000)
-        except KeyError:
-            return None
-        except TypeError:
-            return None
-        
+        return self._state.schedule.holiday_date_end
+
     @property
-    def default_heat_source(self) -> str:
-        try:
-            return self._schedule["defaultHeatSource"]
-        except KeyError:
-            return None
-        except TypeError:
-            return None
\ No newline at end of file
+    def default_heat_source(self) -> Optional[str]:
+        return self._state.schedule.default_heat_source
@@ -0,0 +1,206 @@
+import logging
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+import aiohttp
+from homeassistant import exceptions
+from .rate_limiter import async_get_rate_limiter, PRIORITY_USER, PRIORITY_BACKGROUND
+from .const import (
+    RETRY_ATTEMPTS,
+    RETRY_BACKOFF_BASE,
+    RETRY_BACKOFF_MAX,
+    REQUEST_TIMEOUT,
+    REQUEST_BUDGET,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    CONNECTION_LIMIT,
+    DNS_CACHE_TTL,
+    KEEPALIVE_TIMEOUT,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Only these are safe to send again if we don't know whether the first attempt got through.
+IDEMPOTENT_METHODS = {"GET", "HEAD"}
+
+class CircuitOpenError(exceptions.HomeAssistantError):
+    """Error to indicate the Mixergy API has been failing, so requests aren't being sent."""
+
+class CircuitBreaker:
+    """Stops requests being sent to an API that keeps failing.
+
+    After enough failures in a row the circuit opens and requests fail straight away. Once the reset timeout
+    has passed, requests are let through again; a success closes the circuit, a failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout.total_seconds()
+        self._failures = 0
+        self._opened_at = None
+
+    @property
+    def failures(self):
+        return self._failures
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None and time.monotonic() - self._opened_at < self._reset_timeout
+
+    def check(self, url):
+        if self.is_open:
+            raise CircuitOpenError(f"Not calling {url}, the Mixergy API has failed {self._failures} times in a row")
+
+    def record_success(self):
+
+        if self._opened_at is not None:
+            _LOGGER.info("The Mixergy API is responding again")
+
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self):
+
+        self._failures += 1
+
+        # When half open (the timeout has passed, but the circuit hasn't closed), one more failure reopens it.
+        if self._failures >= self._failure_threshold or self._opened_at is not None:
+
+            if not self.is_open:
+                _LOGGER.warning("The Mixergy API has failed %i times in a row, pausing requests for %is", self._failures, self._reset_timeout)
+
+            self._opened_at = time.monotonic()
+
+def _backoff(attempt):
+    # Exponential backoff with full jitter.
+    delay = min(RETRY_BACKOFF_MAX.total_seconds(), RETRY_BACKOFF_BASE.total_seconds() * 2 ** (attempt - 1))
+    return random.uniform(0, delay)
+
+class Transport:
+    """Sends requests to the Mixergy API for an account.
+
+    Every attempt has a timeout, and all the attempts for one request share an overall budget. Idempotent
+    requests are retried, with backoff, after network errors, timeouts and 5xx or 429 responses. Failures
+    feed the account's circuit breaker.
+
+    Every attempt also has to get through the rate limiter shared by all accounts. Writes and logins are
+    treated as user-initiated, so they're let through ahead of background polls.
+
+    Rather than Home Assistant's shared session, each account has its own, tuned for polling one host: it
+    keeps connections alive between polls and caches DNS lookups, so most polls reuse an open TLS connection.
+    """
+
+    def __init__(self, hass, breaker: CircuitBreaker, attempts=RETRY_ATTEMPTS):
+        self._hass = hass
+        self.breaker = breaker
+        self._limiter = async_get_rate_limiter(hass)
+        self._attempts = attempts
+        self._session = None
+        self.connections_created = 0
+        self.connections_reused = 0
+
+    def _get_session(self):
+
+        if self._session is None or self._session.closed:
+
+            connector = aiohttp.TCPConnector(
+                limit=CONNECTION_LIMIT,
+                limit_per_host=CONNECTION_LIMIT,
+                ttl_dns_cache=DNS_CACHE_TTL.total_seconds(),
+                keepalive_timeout=KEEPALIVE_TIMEOUT.total_seconds(),
+                ssl=False,
+            )
+
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(self._on_connection_created)
+            trace_config.on_connection_reuseconn.append(self._on_connection_reused)
+
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"Accept-Encoding": "gzip, deflate"},
+                trace_configs=[trace_config],
+            )
+
+        return self._session
+
+    async def _on_connection_created(self, session, context, params):
+        self.connections_created += 1
+
+    async def _on_connection_reused(self, session, context, params):
+        self.connections_reused += 1
+
+    async def async_close(self):
+
+        if self._session is not None and not self._session.closed:
+            _LOGGER.debug("Closing session, %i connection(s) opened, %i reused", self.connections_created, self.connections_reused)
+            await self._session.close()
+
+        self._session = None
+
+    async def send(self, method, url, priority=None, **kwargs):
+        """Sends a request and returns the response, which the caller must release."""
+
+        if priority is None:
+            priority = PRIORITY_BACKGROUND if method in IDEMPOTENT_METHODS else PRIORITY_USER
+
+        loop = asyncio.get_running_loop()
+
+        deadline = loop.time() + REQUEST_BUDGET.total_seconds()
+
+        attempts = self._attempts if method in IDEMPOTENT_METHODS else 1
+
+        session = self._get_session()
+
+        attempt = 0
+
+        while True:
+
+            attempt += 1
+
+            self.breaker.check(url)
+
+            try:
+                # Waiting for the rate limiter counts against the budget too, so the attempt's timeout is only
+                # worked out once it's through.
+                async with self._limiter.acquire(priority, max(0, deadline - loop.time())):
+                    timeout = aiohttp.ClientTimeout(total=max(0.1, min(REQUEST_TIMEOUT.total_seconds(), deadline - loop.time())))
+
+                    resp = await session.request(method, url, timeout=timeout, **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                self.breaker.record_failure()
+
+                if not self._can_retry(attempt, attempts, deadline):
+                    raise
+
+                _LOGGER.debug("Call to %s failed (%s), retrying", url, err or type(err).__name__)
+            else:
+                if resp.status < 500 and resp.status != 429:
+                    self.breaker.record_success()
+                    return resp
+
+                # A 429 means we're being throttled, which isn't the API failing.
+                if resp.status != 429:
+                    self.breaker.record_failure()
+
+                if not self._can_retry(attempt, attempts, deadline):
+                    return resp
+
+                _LOGGER.debug("Call to %s failed with status %i, retrying", url, resp.status)
+
+                resp.release()
+
+            await asyncio.sleep(min(_backoff(attempt), max(0, deadline - loop.time())))
+
+    @asynccontextmanager
+    async def request(self, method, url, **kwargs):
+
+        resp = await self.send(method, url, **kwargs)
+
+        try:
+            yield resp
+        finally:
+            resp.release()
+
+    def _can_retry(self, attempt, attempts, deadline):
+        return attempt < attempts and asyncio.get_running_loop().time() < deadline
@@ -0,0 +1,61 @@
+import logging
+import asyncio
+from .single_flight import wait_shared
+
+_LOGGER = logging.getLogger(__name__)
+
+class WriteCoalescer:
+    """Merges writes made in quick succession into a single call.
+
+    Each write waits for the changes to settle (up to a maximum delay from the first write), then all of the
+    fields are sent together. Every caller in the burst waits on, and gets the result of, that one call.
+    """
+
+    def __init__(self, hass, flush, delay, max_delay):
+        self._hass = hass
+        self._flush = flush
+        self._delay = delay.total_seconds()
+        self._max_delay = max_delay.total_seconds()
+        self._pending = {}
+        self._batch = None
+        self._deadline = None
+        self._handle = None
+
+    async def write(self, fields):
+
+        loop = asyncio.get_running_loop()
+
+        self._pending.update(fields)
+
+        if self._batch is None:
+            self._batch = loop.create_future()
+            self._deadline = loop.time() + self._max_delay
+
+        if self._handle is not None:
+            self._handle.cancel()
+
+        delay = min(self._delay, max(0, self._deadline - loop.time()))
+
+        self._handle = loop.call_later(delay, self._start_flush)
+
+        return await wait_shared(self._batch)
+
+    def _start_flush(self):
+
+        payload, self._pending = self._pending, {}
+        batch, self._batch = self._batch, None
+        self._handle = None
+
+        _LOGGER.debug("Writing %i coalesced field(s): %s", len(payload), ", ".join(payload))
+
+        self._hass.async_create_task(self._async_flush(payload, batch))
+
+    async def _async_flush(self, payload, batch):
+
+        try:
+            result = await self._flush(payload)
+        except Exception as err:  # pylint: disable=broad-except
+            batch.set_exception(err)
+            return
+
+        batch.set_result(result)
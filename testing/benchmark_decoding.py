@@ -0,0 +1,64 @@
+import json
+import os
+import sys
+import timeit
+import types
+import importlib
+
+# Load the integration's models without its __init__, which needs Home Assistant.
+package_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "custom_components", "mixergy")
+package = types.ModuleType("mixergy")
+package.__path__ = [package_path]
+sys.modules["mixergy"] = package
+
+decoder = importlib.import_module("mixergy.decoder")
+models = importlib.import_module("mixergy.models")
+
+iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+state = {
+    "current": {
+        "target": 80,
+        "heat_source": "Electric",
+        "immersion": "On",
+        "schedule": [{"start": i * 1800, "end": i * 1800 + 900, "target": 50} for i in range(24)],
+    }
+}
+
+body = json.dumps({
+    "topTemperature": 55.4,
+    "bottomTemperature": 18.2,
+    "charge": 42.7,
+    "pvEnergy": 1200,
+    "clampPower": 350,
+    "state": json.dumps(state),
+    "recordedTime": 1700000000000,
+    "_links": {"self": {"href": "https://www.mixergy.io/api/v2/tanks/1/measurements/latest"}},
+}).encode()
+
+def parse(previous=None):
+    measurement = models.Measurement.from_json(decoder.loads(body), previous)
+    # Read a heat source, as the entities do, so the embedded state is decoded if it needs to be.
+    measurement.electric_heat_source
+    return measurement
+
+def baseline():
+    # The old parse path: decode the body, then decode the embedded state again every time.
+    tank_result = json.loads(body)
+    json.loads(tank_result["state"])["current"]
+
+print(f"{len(body)} byte measurement, {iterations} iterations")
+
+baseline_time = timeit.timeit(baseline, number=iterations)
+print(f"{'json, state decoded every time':40} {baseline_time / iterations * 1e6:8.2f} us")
+
+for name in decoder.DECODERS:
+    decoder.set_decoder(name)
+
+    eager = timeit.timeit(parse, number=iterations)
+
+    previous = parse()
+    repeated = timeit.timeit(lambda: parse(previous), number=iterations)
+
+    print(f"{name + ', new state':40} {eager / iterations * 1e6:8.2f} us")
+    print(f"{name + ', unchanged state':40} {repeated / iterations * 1e6:8.2f} us")
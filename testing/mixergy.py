@@ -82,6 +82,22 @@ for i, subjobj in enumerate(tanks):
         print("Control Url:", control_url)
         print("Model:",modelCode)
 
+        schedule_url = tank_result["_links"]["schedule"]["href"]
+        print("Schedule Url:", schedule_url)
+
+        # The schedule API returns text/plain as the content-type, so decode the body ourselves.
+        result = requests.get(schedule_url, headers=headers)
+
+        schedule_result = json.loads(result.text)
+
+        print("Schedule:", json.dumps(schedule_result, indent=2))
+
+        # Keep a copy, so the schedule's format can be checked against a real payload.
+        with open("schedule.json", "w") as schedule_file:
+            json.dump(schedule_result, schedule_file, indent=2)
+
+        print("Saved the schedule to schedule.json")
+
         result = requests.get(latest_measurement_url, headers=headers)
 
         latest_measurement_result = result.json()